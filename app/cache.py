@@ -0,0 +1,180 @@
+import hashlib
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from .config import OCR_CACHE_ENABLED, OCR_CACHE_SIZE, OCR_CACHE_TTL, AUTH_CACHE_SIZE, AUTH_CACHE_TTL
+from .db import get_repo
+from .ocr import ocr_settings
+
+
+class TTLCache:
+    """LRU dict with a per-entry time to live.
+
+    Not thread-safe; it is only used from the event loop thread.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+
+    def get(self, key, default=None):
+        item = self._data.get(key)
+        if item is None:
+            return default
+        value, expires_at = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        self._data[key] = (value, time.monotonic() + self.ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+def ocr_cache_key(content_hash, page=None):
+    """sha256 over the image's content hash and the OCR settings that shape the output.
+
+    ``page`` is the 0-based page of a PDF; each page is cached on its own.
+    """
+    if page is not None:
+        content_hash = f"{content_hash}#page{page}"
+    return hashlib.sha256(f"{content_hash}|{ocr_settings(page is not None)}".encode()).hexdigest()
+
+
+# Parts of a run_ocr result worth caching (timings describe one run only)
+CACHED_FIELDS = ("text", "template", "confidence", "fields", "phash")
+
+
+class OCRCache:
+    """Two-tier OCR result cache: in-process TTLCache, then the ocr_cache collection.
+
+    ``collection`` defaults to the repository's, resolved at use since the
+    repository is only connected in the app lifespan.
+    """
+
+    def __init__(self, collection=None, maxsize=OCR_CACHE_SIZE, ttl=OCR_CACHE_TTL, enabled=OCR_CACHE_ENABLED):
+        self._collection = collection
+        self.enabled = enabled
+        self.memory = TTLCache(maxsize, ttl)
+        self.memory_hits = 0
+        self.mongo_hits = 0
+        self.misses = 0
+        # OCR time the hits would otherwise have cost
+        self.saved_ms = 0
+
+    @property
+    def collection(self):
+        return self._collection if self._collection is not None else get_repo().ocr_cache
+
+    async def get(self, key):
+        if not self.enabled:
+            return None
+        entry = self.memory.get(key)
+        if entry is not None:
+            self.memory_hits += 1
+            self.saved_ms += entry["ocrMs"]
+            return entry["result"]
+        try:
+            doc = await self.collection.find_one({"hash": key}, {"_id": 0, "result": 1, "ocrMs": 1})
+        except PyMongoError:
+            doc = None
+        if doc is None:
+            self.misses += 1
+            return None
+        self.mongo_hits += 1
+        self.saved_ms += doc.get("ocrMs", 0)
+        self.memory.set(key, {"result": doc["result"], "ocrMs": doc.get("ocrMs", 0)})
+        return doc["result"]
+
+    async def put(self, key, result, ocr_ms):
+        if not self.enabled:
+            return
+        result = {k: result[k] for k in CACHED_FIELDS if k in result}
+        self.memory.set(key, {"result": result, "ocrMs": ocr_ms})
+        try:
+            await self.collection.update_one(
+                {"hash": key},
+                {"$setOnInsert": {"hash": key, "result": result, "ocrMs": ocr_ms, "createdAt": datetime.utcnow()}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            # Another worker stored the same image first
+            pass
+        except PyMongoError:
+            # The cache is best effort; the OCR result is still returned
+            pass
+
+    def stats(self):
+        hits = self.memory_hits + self.mongo_hits
+        lookups = hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "memoryEntries": len(self.memory),
+            "memoryHits": self.memory_hits,
+            "mongoHits": self.mongo_hits,
+            "misses": self.misses,
+            "hitRate": round(hits / lookups, 4) if lookups else 0.0,
+            "savedOcrMs": self.saved_ms,
+        }
+
+
+ocr_cache = OCRCache()
+
+
+class PrincipalCache:
+    """Authenticated users keyed by token subject (email), for get_current_user."""
+
+    def __init__(self, maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL):
+        self.entries = TTLCache(maxsize, ttl)
+        self.hits = 0
+        self.misses = 0
+        # Requests authenticated from token claims alone (AUTH_TRUST_TOKEN_CLAIMS)
+        self.claims = 0
+
+    def get(self, subject):
+        user = self.entries.get(subject)
+        if user is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return user
+
+    def set(self, subject, user):
+        self.entries.set(subject, user)
+
+    def invalidate(self, subject):
+        # Call whenever a user is changed or deleted
+        self.entries.pop(subject)
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "claimsTrusted": self.claims,
+        }
+
+
+principal_cache = PrincipalCache()
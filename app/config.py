@@ -1,11 +1,117 @@
 import os
 
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
-DB_NAME = os.getenv("DB_NAME", "kyc_db")
+DB_NAME = os.getenv("DB_NAME", "kyc_database")
+# One pooled Motor client per API process, created in the app lifespan.
+# Timeouts are in milliseconds; MONGO_WAIT_QUEUE_TIMEOUT_MS bounds how long a
+# request waits for a free pooled connection.
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 100))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 0))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", 300000))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", 5000))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", 5000))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", 30000))
+# Write concern: w is a number of members or "majority"; j waits for the journal
+MONGO_WRITE_CONCERN_W = os.getenv("MONGO_WRITE_CONCERN_W", "1")
+MONGO_WRITE_CONCERN_J = os.getenv("MONGO_WRITE_CONCERN_J", "0") == "1"
+MONGO_WRITE_CONCERN_TIMEOUT_MS = int(os.getenv("MONGO_WRITE_CONCERN_TIMEOUT_MS", 5000))
+# Write an upload and its kyc_data row in one transaction: "auto" when the
+# server is a replica set or mongos (standalone servers have no transactions), 1, 0
+MONGO_TRANSACTIONS = os.getenv("MONGO_TRANSACTIONS", "auto")
 UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+# Uploads are streamed to disk in chunks and rejected (413) past the cap
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", 20 * 1024 * 1024))
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 1024 * 1024))
+# Multi-page documents: PDF pages plus extra images, OCR'd in parallel
+DOCUMENT_MAX_PAGES = int(os.getenv("DOCUMENT_MAX_PAGES", 10))
+# PDF pages are rendered at this resolution (and not resized afterwards)
+PDF_RENDER_DPI = int(os.getenv("PDF_RENDER_DPI", 300))
+# Pages whose render would exceed this many pixels are rendered at a lower
+# resolution instead (a 200-inch page at 300 DPI would need gigabytes)
+PDF_MAX_PAGE_PIXELS = int(os.getenv("PDF_MAX_PAGE_PIXELS", 36_000_000))
 # Ensure TESSERACT_CMD can be set if tesseract binary not on PATH
 TESSERACT_CMD = os.getenv("TESSERACT_CMD", None)
 
+# OCR execution engine: worker processes (defaults to one per core) and how many
+# extra jobs may wait for a free worker before uploads are rejected with 429
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", os.cpu_count() or 1))
+OCR_QUEUE_DEPTH = int(os.getenv("OCR_QUEUE_DEPTH", 16))
+OCR_LANG = os.getenv("OCR_LANG", "eng")
+OCR_PSM = int(os.getenv("OCR_PSM", 3))
+# auto | tesserocr | pytesseract (see app/ocr_backends.py)
+OCR_BACKEND = os.getenv("OCR_BACKEND", "auto")
+# Directory holding *.traineddata for tesserocr, if not the library default
+TESSDATA_PREFIX = os.getenv("TESSDATA_PREFIX", None)
+
+# Preprocessing stages run before Tesseract, in order; any of
+# exif, grayscale, resize, threshold, deskew (empty string disables)
+PREPROCESS_STAGES = os.getenv("PREPROCESS_STAGES", "exif,grayscale,resize,threshold")
+PREPROCESS_TARGET_DPI = int(os.getenv("PREPROCESS_TARGET_DPI", 300))
+PREPROCESS_THRESHOLD_BLOCK = int(os.getenv("PREPROCESS_THRESHOLD_BLOCK", 31))
+PREPROCESS_THRESHOLD_OFFSET = int(os.getenv("PREPROCESS_THRESHOLD_OFFSET", 10))
+PREPROCESS_DESKEW_MAX_ANGLE = float(os.getenv("PREPROCESS_DESKEW_MAX_ANGLE", 5))
+
+# Region-of-interest OCR for known card layouts (app/templates.py); below the
+# confidence threshold the full page is OCR'd instead
+TEMPLATES_ENABLED = os.getenv("TEMPLATES_ENABLED", "1") == "1"
+TEMPLATE_MIN_CONFIDENCE = float(os.getenv("TEMPLATE_MIN_CONFIDENCE", 0.8))
+TEMPLATE_THREADS = int(os.getenv("TEMPLATE_THREADS", 4))
+
+# Authenticated-user cache in front of the users lookup in get_current_user
+# (entries / seconds). Each API process has its own cache, so a changed or
+# deleted user can be served from other processes for up to AUTH_CACHE_TTL.
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", 10000))
+AUTH_CACHE_TTL = int(os.getenv("AUTH_CACHE_TTL", 60))
+# Build the user from the signed token claims (uid, name) with no DB lookup
+AUTH_TRUST_TOKEN_CLAIMS = os.getenv("AUTH_TRUST_TOKEN_CLAIMS", "0") == "1"
+
+# Reject Aadhaar numbers failing the Verhoeff check digit and PANs with an
+# unknown holder-type letter instead of storing them with low confidence
+EXTRACT_VERIFY_CHECKSUMS = os.getenv("EXTRACT_VERIFY_CHECKSUMS", "1") == "1"
+
+# OCR result cache keyed by sha256(image bytes + OCR settings): an in-process
+# LRU (entries / seconds) in front of the ocr_cache Mongo collection
+OCR_CACHE_ENABLED = os.getenv("OCR_CACHE_ENABLED", "1") == "1"
+OCR_CACHE_SIZE = int(os.getenv("OCR_CACHE_SIZE", 1024))
+OCR_CACHE_TTL = int(os.getenv("OCR_CACHE_TTL", 3600))
+OCR_CACHE_MONGO_TTL = int(os.getenv("OCR_CACHE_MONGO_TTL", 30 * 24 * 3600))
+
+# Batch ingestion: background workers draining the Mongo-backed job queue
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", 2))
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", 100))
+BATCH_MAX_ZIP_BYTES = int(os.getenv("BATCH_MAX_ZIP_BYTES", 200 * 1024 * 1024))
+BATCH_POLL_INTERVAL = float(os.getenv("BATCH_POLL_INTERVAL", 2.0))
+# Files each batch worker claims and OCRs together; their records are then
+# written with one insert_many per collection
+BATCH_WRITE_SIZE = int(os.getenv("BATCH_WRITE_SIZE", 4))
+# Pages all batch workers of a process may have in the OCR pool at once.
+# Keep it below OCR_WORKERS + OCR_QUEUE_DEPTH so the queue always has room
+# for interactive /upload/ requests
+BATCH_OCR_CONCURRENCY = max(1, int(os.getenv("BATCH_OCR_CONCURRENCY", OCR_WORKERS)))
+# Files claimed longer than this (seconds) are put back on the queue, at
+# startup and then checked every half timeout by the workers; keep it above
+# the longest a file takes to process
+BATCH_CLAIM_TIMEOUT = int(os.getenv("BATCH_CLAIM_TIMEOUT", 600))
+
+# Fraud screening at upload: earlier uploads whose perceptual image hash is
+# within PHASH_MAX_DISTANCE of its 256 bits (0: identical after downscaling),
+# and Aadhaar/PAN numbers already on another account. Hashes written by other
+# processes are picked up every PHASH_REFRESH_INTERVAL seconds (0: at startup only)
+PHASH_ENABLED = os.getenv("PHASH_ENABLED", "1") == "1"
+PHASH_MAX_DISTANCE = int(os.getenv("PHASH_MAX_DISTANCE", 6))
+PHASH_MAX_MATCHES = int(os.getenv("PHASH_MAX_MATCHES", 5))
+PHASH_REFRESH_INTERVAL = float(os.getenv("PHASH_REFRESH_INTERVAL", 10))
+
+# Sampled request profiling: the fraction of requests traced (0 disables; while
+# enabled an `X-Profile: <PROFILE_TOKEN>` header forces a trace, and with no
+# token set the header is ignored), where the traces go and which profiler
+# writes them (cprofile, or pyinstrument if installed)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILER = os.getenv("PROFILER", "cprofile")
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+
 # Ensure UPLOAD_DIR is an absolute path and exists
 UPLOAD_DIR = os.path.abspath(UPLOAD_DIR)
 os.makedirs(UPLOAD_DIR, exist_ok=True)
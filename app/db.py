@@ -1,10 +1,167 @@
+"""The application's one MongoDB client and the writes that span collections.
+
+``connect()`` is called from the app lifespan and creates a single pooled
+Motor client for the process; everything else reaches the collections
+through ``get_repo()``.
+"""
+import asyncio
+
+from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorClient
-from .config import MONGO_URI, DB_NAME
+from pymongo import WriteConcern
+
+from .config import (
+    MONGO_URI, DB_NAME, OCR_CACHE_MONGO_TTL,
+    MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE, MONGO_MAX_IDLE_TIME_MS, MONGO_WAIT_QUEUE_TIMEOUT_MS,
+    MONGO_CONNECT_TIMEOUT_MS, MONGO_SERVER_SELECTION_TIMEOUT_MS, MONGO_SOCKET_TIMEOUT_MS,
+    MONGO_WRITE_CONCERN_W, MONGO_WRITE_CONCERN_J, MONGO_WRITE_CONCERN_TIMEOUT_MS, MONGO_TRANSACTIONS,
+)
+from .metrics import MongoCommandMetrics, MongoPoolMetrics
+
+
+def write_concern(w=MONGO_WRITE_CONCERN_W, j=MONGO_WRITE_CONCERN_J, wtimeout=MONGO_WRITE_CONCERN_TIMEOUT_MS):
+    return WriteConcern(w=int(w) if str(w).isdigit() else w, j=j or None, wtimeout=wtimeout or None)
+
+
+def create_client(uri=MONGO_URI):
+    return AsyncIOMotorClient(
+        uri,
+        maxPoolSize=MONGO_MAX_POOL_SIZE,
+        minPoolSize=MONGO_MIN_POOL_SIZE,
+        maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS or None,
+        waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS or None,
+        connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+        serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS or None,
+        # Pool and command listeners feed the Mongo series on /metrics
+        event_listeners=[MongoPoolMetrics(), MongoCommandMetrics()],
+    )
+
+
+class Repository:
+    """Collections of one database on one client (or any stand-in with the Motor API)."""
+
+    def __init__(self, client=None, db_name=DB_NAME, transactions=False):
+        self.client = client if client is not None else create_client()
+        self.db = self.client.get_database(db_name, write_concern=write_concern())
+        self.users = self.db.get_collection("users")
+        self.documents = self.db.get_collection("uploaded_documents")
+        self.kyc = self.db.get_collection("kyc_data")
+        self.jobs = self.db.get_collection("ingest_jobs")
+        self.ocr_cache = self.db.get_collection("ocr_cache")
+        self.image_hashes = self.db.get_collection("image_hashes")
+        # Replica sets and mongos only; see supports_transactions()
+        self.transactions = transactions
+
+    async def supports_transactions(self):
+        hello = await self.client.admin.command("hello")
+        return "setName" in hello or hello.get("msg") == "isdbgrid"
+
+    async def ensure_indexes(self):
+        await self.users.create_index("email", unique=True)
+
+        # /api/get-user-docs pages through a user's uploads newest first
+        await self.documents.create_index([("userId", 1), ("uploadedAt", -1), ("_id", -1)])
+        await self.documents.create_index([("userId", 1), ("docType", 1), ("uploadedAt", -1), ("_id", -1)])
+        await self.kyc.create_index("userId")
+        await self.kyc.create_index("documentId")
+        # Fraud screening: is this ID number on another account? Partial, so
+        # the many documents without the field stay out of the index
+        for field in ("aadhaarNumber", "panNumber"):
+            await self.kyc.create_index(
+                [(f"parsedData.{field}", 1), ("userId", 1)],
+                partialFilterExpression={f"parsedData.{field}": {"$type": "string"}},
+            )
+
+        # Workers claim the oldest job that still has queued files
+        await self.jobs.create_index([("status", 1), ("createdAt", 1)])
+        await self.jobs.create_index("userId")
+
+        # Each process loads every image hash at startup, then only new ones
+        await self.image_hashes.create_index("createdAt")
+        await self.image_hashes.create_index("documentId")
+
+        await self.ocr_cache.create_index("hash", unique=True)
+        if OCR_CACHE_MONGO_TTL > 0:
+            await self.ocr_cache.create_index("createdAt", expireAfterSeconds=OCR_CACHE_MONGO_TTL)
+
+    # -------------------- DOCUMENT WRITES --------------------
+    async def insert_document(self, record, kyc):
+        """Write an upload and its kyc_data row; returns the upload's _id.
+
+        ``kyc`` gets ``documentId`` pointing at the upload.
+        """
+        return (await self.insert_documents([(record, kyc)]))[0]
+
+    async def insert_documents(self, pairs):
+        """Bulk insert [(record, kyc)] pairs: one insert_many per collection.
+
+        _ids are assigned here so both collections can be written at once. In
+        a transaction both commit or neither does; without one, the kyc rows
+        of uploads that failed to insert (and vice versa) are deleted again.
+        """
+        if not pairs:
+            return []
+        records, kycs = [record for record, _ in pairs], [kyc for _, kyc in pairs]
+        for record, kyc in pairs:
+            record["_id"] = ObjectId()
+            kyc["_id"] = ObjectId()
+            kyc["documentId"] = record["_id"]
+
+        if self.transactions:
+            async def write(session):
+                # A session runs one operation at a time
+                await self.documents.insert_many(records, session=session)
+                await self.kyc.insert_many(kycs, session=session)
+
+            async with await self.client.start_session() as session:
+                await session.with_transaction(write)
+            return [record["_id"] for record in records]
+
+        results = await asyncio.gather(
+            self.documents.insert_many(records, ordered=False),
+            self.kyc.insert_many(kycs, ordered=False),
+            return_exceptions=True,
+        )
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            # Either side may have partly succeeded; remove both halves
+            await asyncio.gather(
+                self.documents.delete_many({"_id": {"$in": [record["_id"] for record in records]}}),
+                self.kyc.delete_many({"_id": {"$in": [kyc["_id"] for kyc in kycs]}}),
+                return_exceptions=True,
+            )
+            raise errors[0]
+        return [record["_id"] for record in records]
+
+    def close(self):
+        self.client.close()
+
+
+_repo = None
+
+
+async def connect(client=None, db_name=DB_NAME):
+    """Create the process-wide repository and its indexes (app lifespan)."""
+    global _repo
+    repo = Repository(client, db_name)
+    if MONGO_TRANSACTIONS == "auto":
+        repo.transactions = await repo.supports_transactions()
+    else:
+        repo.transactions = MONGO_TRANSACTIONS == "1"
+    await repo.ensure_indexes()
+    _repo = repo
+    return repo
+
+
+def get_repo():
+    if _repo is None:
+        raise RuntimeError("MongoDB is not connected; db.connect() runs in the app lifespan")
+    return _repo
 
-client = AsyncIOMotorClient(MONGO_URI)
-db = client[DB_NAME]
 
-# Collections
-users_coll = db.get_collection("users")
-documents_coll = db.get_collection("uploaded_documents")
-kyc_coll = db.get_collection("extracted_kyc")
+def close():
+    global _repo
+    if _repo is not None:
+        _repo.close()
+        _repo = None
@@ -0,0 +1,77 @@
+"""Keyset-paginated, streamed listing of a user's uploaded documents."""
+import base64
+import json
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from .db import get_repo
+
+# Newest first; _id breaks ties between uploads in the same microsecond
+SORT = [("uploadedAt", -1), ("_id", -1)]
+
+
+class InvalidCursor(Exception):
+    """The pagination cursor could not be decoded."""
+
+
+def encode_cursor(doc):
+    raw = f"{doc['uploadedAt']}|{doc['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        uploaded_at, doc_id = base64.urlsafe_b64decode(padded).decode().rsplit("|", 1)
+        return uploaded_at, ObjectId(doc_id)
+    except (ValueError, InvalidId, UnicodeDecodeError) as e:
+        raise InvalidCursor(str(e)) from e
+
+
+def page_query(user_id, cursor=None, doc_type=None):
+    query = {"userId": user_id}
+    if doc_type:
+        query["docType"] = doc_type
+    if cursor:
+        uploaded_at, doc_id = decode_cursor(cursor)
+        # Strictly after the last document of the previous page in SORT order
+        query["$or"] = [
+            {"uploadedAt": {"$lt": uploaded_at}},
+            {"uploadedAt": uploaded_at, "_id": {"$lt": doc_id}},
+        ]
+    return query
+
+
+def open_page(user_id, limit, cursor=None, doc_type=None, include_raw=False, collection=None):
+    """Cursor over one page (plus one look-ahead document) of a user's uploads."""
+    collection = collection if collection is not None else get_repo().documents
+    projection = None if include_raw else {"rawText": 0}
+    return collection.find(
+        page_query(user_id, cursor, doc_type), projection,
+        sort=SORT, limit=limit + 1, batch_size=min(limit + 1, 100),
+    )
+
+
+def _dumps(value):
+    return json.dumps(value, default=str, ensure_ascii=False)
+
+
+async def stream_page(header, first, docs, limit):
+    """Yield the JSON response one document at a time.
+
+    ``first`` is the already-fetched first document, ``docs`` the rest of the
+    Mongo cursor. Only one document is held in memory at a time.
+    """
+    yield _dumps(header)[:-1] + ', "documents": ['
+    last, count, doc = None, 0, first
+    while doc is not None:
+        if count == limit:
+            # The look-ahead document exists, so there is another page
+            yield f'], "nextCursor": {_dumps(encode_cursor(last))}}}'
+            return
+        doc["_id"] = str(doc["_id"])
+        yield ("," if count else "") + _dumps(doc)
+        last, count = doc, count + 1
+        doc = await anext(docs, None)
+    yield '], "nextCursor": null}'
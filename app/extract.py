@@ -0,0 +1,201 @@
+"""KYC field extraction from OCR text.
+
+All patterns are compiled once at import and combined into a single
+alternation, so each text is scanned in one ``finditer`` pass: the first
+valid hit per field wins. Every field gets a confidence score, and ID numbers
+are checked before they are accepted (Verhoeff check digit for Aadhaar,
+holder-type letter for PAN), so OCR noise that merely looks like a number is
+rejected instead of stored.
+"""
+import re
+from datetime import datetime
+
+from .config import EXTRACT_VERIFY_CHECKSUMS
+
+FIELDS = ("panNumber", "aadhaarNumber", "name", "fatherName", "dob", "gender", "address")
+
+# Labels that end a name value when OCR puts several fields on one line
+_LABELS = r"(?i:father'?s?\s*name|name|dob|date\s+of\s+birth|year\s+of\s+birth|gender|sex|address)"
+# A person's name: letters up to the next label or non-name character
+_NAME_VALUE = rf"(?:(?![ \t]*{_LABELS}\b)[A-Za-z .'])*"
+# Address continuation lines stop at the next label or ID number
+_ADDRESS_STOP = rf"(?:{_LABELS}\b|\d{{4}}[ ]?\d{{4}}[ ]?\d{{4}}\b|[A-Z]{{5}}\d{{4}}[A-Z]\b)"
+
+_FIELD_RE = re.compile(
+    rf"""
+      (?P<aadhaar>(?<![\d])[2-9]\d{{3}}[ ]?\d{{4}}[ ]?\d{{4}}(?![\d]))
+    | (?P<pan>\b[A-Z]{{5}}[0-9]{{4}}[A-Z]\b)
+    | (?P<dob>\b(?:\d{{2}}[-/.]\d{{2}}[-/.]\d{{4}}|\d{{4}}[-/.]\d{{2}}[-/.]\d{{2}})\b)
+    | (?P<gender>(?i:\b(?:male|female|transgender)\b))
+    | (?P<father>(?i:\bfather'?s?\s*name)\s*[:\-]?[ \t]*(?P<father_value>{_NAME_VALUE}))
+    | (?P<name>(?i:\bname)\s*[:\-]?[ \t]*(?P<name_value>{_NAME_VALUE}))
+    | (?P<address>(?i:\baddress)\s*[:\-]?[ \t]*(?P<address_value>[^\n]*(?:\n(?!{_ADDRESS_STOP})[^\n]+){{0,3}}))
+    """,
+    re.VERBOSE,
+)
+_LABEL_SPLIT_RE = re.compile(rf"(?i)\s*\b{_LABELS}\b.*$", re.DOTALL)
+_PERSON_NAME_RE = re.compile(r"[A-Za-z][A-Za-z .']*")
+_SPACE_RE = re.compile(r"\s+")
+
+# 4th character of a PAN: the holder type (Person, Company, HUF, Firm, AOP,
+# Trust, BOI, Local authority, artificial Juridical person, Government)
+PAN_HOLDER_TYPES = frozenset("PCHFATBLJG")
+_DATE_FORMATS = ("%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y", "%Y-%m-%d", "%Y/%m/%d", "%Y.%m.%d")
+
+# Verhoeff dihedral-group tables
+_VERHOEFF_D = (
+    (0, 1, 2, 3, 4, 5, 6, 7, 8, 9),
+    (1, 2, 3, 4, 0, 6, 7, 8, 9, 5),
+    (2, 3, 4, 0, 1, 7, 8, 9, 5, 6),
+    (3, 4, 0, 1, 2, 8, 9, 5, 6, 7),
+    (4, 0, 1, 2, 3, 9, 5, 6, 7, 8),
+    (5, 9, 8, 7, 6, 0, 4, 3, 2, 1),
+    (6, 5, 9, 8, 7, 1, 0, 4, 3, 2),
+    (7, 6, 5, 9, 8, 2, 1, 0, 4, 3),
+    (8, 7, 6, 5, 9, 3, 2, 1, 0, 4),
+    (9, 8, 7, 6, 5, 4, 3, 2, 1, 0),
+)
+_VERHOEFF_P = (
+    (0, 1, 2, 3, 4, 5, 6, 7, 8, 9),
+    (1, 5, 7, 6, 2, 8, 3, 0, 9, 4),
+    (5, 8, 0, 3, 7, 9, 6, 1, 4, 2),
+    (8, 9, 1, 6, 0, 4, 3, 5, 2, 7),
+    (9, 4, 5, 3, 1, 2, 7, 8, 6, 0),
+    (4, 2, 8, 6, 5, 7, 3, 9, 0, 1),
+    (2, 7, 9, 3, 8, 0, 6, 4, 1, 5),
+    (7, 0, 4, 6, 9, 1, 3, 2, 5, 8),
+)
+_VERHOEFF_INV = (0, 4, 3, 2, 1, 5, 6, 7, 8, 9)
+
+
+def _verhoeff_checksum(digits):
+    c = 0
+    for i, ch in enumerate(reversed(digits)):
+        c = _VERHOEFF_D[c][_VERHOEFF_P[i % 8][ord(ch) - 48]]
+    return c
+
+
+def verhoeff_valid(number):
+    return number.isdigit() and _verhoeff_checksum(number) == 0
+
+
+def verhoeff_check_digit(digits):
+    """The digit to append to ``digits`` to make it Verhoeff-valid."""
+    return str(_VERHOEFF_INV[_verhoeff_checksum(digits + "0")])
+
+
+def aadhaar_valid(number):
+    number = number.replace(" ", "")
+    if len(number) != 12 or not number.isdigit() or number[0] in "01":
+        return False
+    return verhoeff_valid(number) or not EXTRACT_VERIFY_CHECKSUMS
+
+
+def pan_valid(pan):
+    if len(pan) != 10 or not (pan[:5].isalpha() and pan[5:9].isdigit() and pan[9].isalpha()):
+        return False
+    return pan[3] in PAN_HOLDER_TYPES or not EXTRACT_VERIFY_CHECKSUMS
+
+
+def _valid_date(value):
+    for fmt in _DATE_FORMATS:
+        try:
+            datetime.strptime(value, fmt)
+            return True
+        except ValueError:
+            continue
+    return False
+
+
+def _person_name(value):
+    value = _LABEL_SPLIT_RE.sub("", value).strip(" :-")
+    if not value or not _PERSON_NAME_RE.fullmatch(value):
+        return None
+    return _SPACE_RE.sub(" ", value)
+
+
+def _empty():
+    return dict.fromkeys(FIELDS), dict.fromkeys(FIELDS, 0.0)
+
+
+def score_field(field, value):
+    """Validate a value for ``field`` found by other means (e.g. template OCR).
+
+    Returns (normalised value, confidence) or (None, 0.0) if it is rejected.
+    """
+    if not value:
+        return None, 0.0
+    if field == "aadhaarNumber":
+        value = value.replace(" ", "")
+        return (value, 0.99 if verhoeff_valid(value) else 0.5) if aadhaar_valid(value) else (None, 0.0)
+    if field == "panNumber":
+        return (value, 0.95 if value[3] in PAN_HOLDER_TYPES else 0.5) if pan_valid(value) else (None, 0.0)
+    if field == "dob":
+        return (value, 0.9) if _valid_date(value) else (None, 0.0)
+    if field == "gender":
+        return value.capitalize(), 0.95
+    if field in ("name", "fatherName"):
+        value = _person_name(value)
+        return (value, 0.85 if " " in value else 0.7) if value else (None, 0.0)
+    return value, 0.6
+
+
+def extract(text):
+    """Extract KYC fields from OCR text; returns (parsed, confidence) dicts."""
+    parsed, confidence = _empty()
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    full_text = "\n".join(lines)
+
+    for m in _FIELD_RE.finditer(full_text):
+        kind = m.lastgroup
+        if kind == "aadhaar":
+            field, value = "aadhaarNumber", m.group("aadhaar")
+        elif kind == "pan":
+            field, value = "panNumber", m.group("pan")
+        elif kind == "dob":
+            field, value = "dob", m.group("dob")
+        elif kind == "gender":
+            field, value = "gender", m.group("gender")
+        elif kind == "father":
+            field, value = "fatherName", m.group("father_value")
+        elif kind == "name":
+            field, value = "name", m.group("name_value")
+        else:
+            field, value = "address", _SPACE_RE.sub(" ", m.group("address_value")).strip(" ,:-")
+        if parsed[field] is not None:
+            continue
+        value, score = score_field(field, value)
+        if value is not None:
+            parsed[field], confidence[field] = value, score
+
+    return parsed, confidence
+
+
+def extract_many(texts):
+    """Extract every text in ``texts``; returns a list of (parsed, confidence)."""
+    return [extract(text) for text in texts]
+
+
+def merge_pages(pages):
+    """Merge per-page (parsed, confidence) pairs into one document.
+
+    The most confident value of each field wins, earlier pages breaking ties.
+    Returns (parsed, confidence, field_pages) where ``field_pages`` maps each
+    found field to the 1-based page it came from.
+    """
+    parsed, confidence = _empty()
+    field_pages = {}
+    for number, (page_parsed, page_confidence) in enumerate(pages, 1):
+        for field in FIELDS:
+            if page_parsed[field] is not None and page_confidence[field] > confidence[field]:
+                parsed[field], confidence[field] = page_parsed[field], page_confidence[field]
+                field_pages[field] = number
+    return parsed, confidence, field_pages
+
+
+def detect_doc_type(parsed):
+    if parsed["aadhaarNumber"]:
+        return "Aadhaar"
+    if parsed["panNumber"]:
+        return "PAN"
+    return "UNKNOWN"
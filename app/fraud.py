@@ -0,0 +1,223 @@
+"""Fraud screening of uploads: near-duplicate images and ID numbers shared across accounts.
+
+Every page's perceptual hash (app/phash.py, computed by the OCR workers) is
+kept in the image_hashes collection and, per process, in an in-memory
+multi-index loaded at startup, so a new upload is compared against every
+earlier page without a database round trip. Aadhaar and PAN numbers are
+looked up in kyc_data through the (number, userId) indexes created in
+Repository.ensure_indexes.
+
+The flags are advisory and stored with the upload; they never reject it.
+Other users' ids are not reported, only how many accounts are involved and
+which documents matched.
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pymongo.errors import PyMongoError
+
+from .config import PHASH_ENABLED, PHASH_MAX_DISTANCE, PHASH_MAX_MATCHES, PHASH_REFRESH_INTERVAL
+from .db import get_repo
+from .metrics import FRAUD_FLAGS, stage_timer
+from .phash import HashIndex, from_bytes, from_hex, informative, to_bytes
+
+# Parsed fields that identify one person
+ID_FIELDS = ("aadhaarNumber", "panNumber")
+
+# A refresh re-reads entries this far behind the newest one it has seen, for
+# inserts that committed late or came from a host with a lagging clock
+REFRESH_OVERLAP = timedelta(seconds=60)
+
+
+class ImageIndex:
+    """HashIndex over the image_hashes collection.
+
+    ``collection`` defaults to the repository's, resolved at use since the
+    repository is only connected in the app lifespan.
+    """
+
+    def __init__(self, collection=None, max_distance=PHASH_MAX_DISTANCE, enabled=PHASH_ENABLED,
+                 refresh_interval=PHASH_REFRESH_INTERVAL):
+        self._collection = collection
+        self.enabled = enabled
+        self.refresh_interval = refresh_interval
+        self.index = HashIndex(max_distance)
+        # _id -> createdAt of the entries inside the refresh overlap
+        self._recent = {}
+        self._newest = None
+        self._task = None
+        self._rebuilding = False
+        self.lookups = 0
+        self.matches = 0
+
+    @property
+    def collection(self):
+        return self._collection if self._collection is not None else get_repo().image_hashes
+
+    def __len__(self):
+        return len(self.index)
+
+    def _add(self, entry):
+        if entry["_id"] in self._recent:
+            return
+        value = from_bytes(entry["hash"])
+        # Blank pages stored before they were filtered out
+        if informative(value):
+            self.index.add(value, entry["userId"], entry["documentId"].binary)
+        created = entry["createdAt"]
+        if self._newest is None or created > self._newest:
+            self._newest = created
+        if created >= self._newest - REFRESH_OVERLAP:
+            self._recent[entry["_id"]] = created
+
+    async def refresh(self):
+        """Index the entries written since the last refresh (all of them on the first call)."""
+        query = {} if self._newest is None else {"createdAt": {"$gte": self._newest - REFRESH_OVERLAP}}
+        projection = {"hash": 1, "userId": 1, "documentId": 1, "createdAt": 1}
+        async for entry in self.collection.find(query, projection):
+            self._add(entry)
+        if self._newest is not None:
+            cutoff = self._newest - REFRESH_OVERLAP
+            self._recent = {_id: created for _id, created in self._recent.items() if created >= cutoff}
+        await self._rebuild()
+
+    async def _rebuild(self):
+        """Sort pending entries into the index tables once there are enough of them."""
+        if self._rebuilding or not self.index.needs_rebuild():
+            return
+        self._rebuilding = True
+        try:
+            # Seconds for millions of entries; lookups meanwhile use the old tables
+            await asyncio.to_thread(self.index.rebuild, len(self.index))
+        finally:
+            self._rebuilding = False
+
+    async def _refresher(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh()
+            except PyMongoError:
+                # Try again next interval; lookups use what is loaded
+                pass
+
+    async def start(self):
+        """Load every stored hash, then keep up with other processes (app lifespan)."""
+        if not self.enabled:
+            return
+        await self.refresh()
+        if self.refresh_interval > 0:
+            self._task = asyncio.create_task(self._refresher())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def match(self, hashes, user_id):
+        """Earlier documents with a page near one of ``hashes`` (hex, one per page).
+
+        None and uninformative hashes (blank pages, see phash.informative)
+        are skipped: every user's blank page would match them.
+
+        Returns up to PHASH_MAX_MATCHES {documentId, page, distance, sameUser},
+        nearest first, one per document.
+        """
+        best = {}
+        for page, value in enumerate(hashes, 1):
+            if value is None or not informative(value := from_hex(value)):
+                continue
+            self.lookups += 1
+            for distance, owner, document_id in self.index.query(value, limit=PHASH_MAX_MATCHES):
+                if document_id not in best or distance < best[document_id]["distance"]:
+                    best[document_id] = {
+                        "documentId": str(ObjectId(document_id)),
+                        "page": page,
+                        "distance": distance,
+                        "sameUser": owner == user_id,
+                    }
+        found = sorted(best.values(), key=lambda match: match["distance"])[:PHASH_MAX_MATCHES]
+        self.matches += len(found)
+        return found
+
+    async def insert(self, records):
+        """Index the page hashes of written uploads (records with their ``_id``)."""
+        if not self.enabled:
+            return
+        entries = []
+        now = datetime.utcnow()
+        for record in records:
+            document_id = ObjectId(record["_id"])
+            for page in record["pages"]:
+                if page.get("phash") is None or not informative(value := from_hex(page["phash"])):
+                    continue
+                entries.append({
+                    "_id": ObjectId(),
+                    "hash": to_bytes(value),
+                    "userId": record["userId"],
+                    "documentId": document_id,
+                    "page": page["page"],
+                    "createdAt": now,
+                })
+        if not entries:
+            return
+        for entry in entries:
+            self._add(entry)
+        await self._rebuild()
+        try:
+            await self.collection.insert_many(entries, ordered=False)
+        except PyMongoError:
+            # Best effort, like the OCR cache: this process still matches
+            # against the hashes, other processes and restarts won't
+            pass
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "entries": len(self.index),
+            "maxDistance": self.index.max_distance,
+            "lookups": self.lookups,
+            "matches": self.matches,
+        }
+
+
+image_index = ImageIndex()
+
+
+async def shared_ids(parsed, user_id, collection=None):
+    """ID numbers in ``parsed`` already on other accounts: [{field, otherAccounts}]."""
+    collection = collection if collection is not None else get_repo().kyc
+    fields = [field for field in ID_FIELDS if parsed.get(field)]
+
+    async def other_accounts(field):
+        # Answered from the (parsedData.<field>, userId) index alone
+        return await collection.distinct(
+            "userId", {f"parsedData.{field}": parsed[field], "userId": {"$ne": user_id}},
+        )
+
+    found = await asyncio.gather(*(other_accounts(field) for field in fields))
+    return [{"field": field, "otherAccounts": len(users)} for field, users in zip(fields, found) if users]
+
+
+async def screen(hashes, parsed, user_id):
+    """Fraud flags for a document about to be written by ``user_id``."""
+    with stage_timer("phash_lookup"):
+        duplicates = image_index.match(hashes, user_id) if image_index.enabled else []
+    with stage_timer("shared_ids_lookup"):
+        shared = await shared_ids(parsed, user_id)
+
+    cross_account = any(not match["sameUser"] for match in duplicates)
+    if duplicates:
+        FRAUD_FLAGS.inc(flag="near_duplicate")
+    if cross_account:
+        FRAUD_FLAGS.inc(flag="cross_account_image")
+    if shared:
+        FRAUD_FLAGS.inc(flag="shared_id")
+    return {
+        "flagged": cross_account or bool(shared),
+        "nearDuplicates": duplicates,
+        "crossAccountImage": cross_account,
+        "sharedIds": shared,
+    }
@@ -0,0 +1,316 @@
+"""Mongo-backed batch ingestion queue and its background workers.
+
+A job is one document in ``ingest_jobs`` holding a ``files`` array; workers
+claim files one at a time with a conditional ``find_one_and_update`` so several
+workers (or several API processes) can drain the same job in parallel.
+"""
+import asyncio
+import os
+import time
+import zipfile
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ReturnDocument
+
+from .config import (
+    BATCH_WORKERS, BATCH_POLL_INTERVAL, BATCH_CLAIM_TIMEOUT, BATCH_MAX_FILES, BATCH_MAX_ZIP_BYTES, BATCH_WRITE_SIZE,
+    BATCH_OCR_CONCURRENCY,
+)
+from .db import get_repo
+from .fraud import image_index
+from .metrics import DOCUMENTS, FAILURES, stage_timer
+from .ocr import OCRQueueFull
+from .pipeline import build_document
+from .utils import (
+    DOCUMENT_TYPES, UnsupportedFileType, UploadRejected, UploadTooLarge, spool_stream, spool_upload,
+)
+
+ZIP_TYPE = "application/zip"
+
+
+def _extract_zip(zip_path, spooled):
+    # Appends (filename, spool) for every non-empty image or PDF member; other
+    # members are skipped, but one over the size cap rejects the batch as it
+    # would if uploaded on its own
+    with zipfile.ZipFile(zip_path) as archive:
+        for info in archive.infolist():
+            name = os.path.basename(info.filename)
+            if info.is_dir() or info.filename.startswith("__MACOSX/") or not name:
+                continue
+            with archive.open(info) as member:
+                try:
+                    spool = spool_stream(member, allowed=DOCUMENT_TYPES)
+                except UnsupportedFileType:
+                    continue
+                except UploadTooLarge as e:
+                    raise UploadTooLarge(f"{info.filename}: {e}") from e
+            if not spool.size:
+                spool.discard()
+                continue
+            spooled.append((name, spool))
+            if len(spooled) > BATCH_MAX_FILES:
+                # Enough to reject the batch; don't unpack the rest
+                break
+
+
+def _commit_all(spooled):
+    return [(filename, spool.commit()) for filename, spool in spooled]
+
+
+async def stage_uploads(upload_files):
+    """Stream the uploaded files (expanding zips) into storage, returning [(filename, stored)].
+
+    Everything is spooled first and only committed to storage once the whole
+    batch is accepted, so a rejected batch leaves no unreferenced files.
+    """
+    spooled = []
+    try:
+        for upload_file in upload_files:
+            spool = await spool_upload(
+                upload_file, allowed=DOCUMENT_TYPES | {ZIP_TYPE}, type_limits={ZIP_TYPE: BATCH_MAX_ZIP_BYTES},
+            )
+            if spool.content_type == ZIP_TYPE:
+                try:
+                    await asyncio.to_thread(_extract_zip, spool.path, spooled)
+                except zipfile.BadZipFile:
+                    raise UploadRejected(f"{upload_file.filename} is not a valid zip archive")
+                finally:
+                    spool.discard()
+            elif not spool.size:
+                spool.discard()
+                raise UploadRejected(f"{upload_file.filename} is empty")
+            else:
+                spooled.append((upload_file.filename, spool))
+            if len(spooled) > BATCH_MAX_FILES:
+                raise UploadTooLarge(f"A batch may contain at most {BATCH_MAX_FILES} files")
+        return await asyncio.to_thread(_commit_all, spooled)
+    except BaseException:
+        for _, spool in spooled:
+            spool.discard()
+        raise
+
+
+class BatchQueue:
+    """Job queue over a Motor collection (or any stand-in with the same API).
+
+    ``collection`` defaults to the repository's ingest_jobs, resolved at use.
+    """
+
+    def __init__(self, collection=None, write_size=BATCH_WRITE_SIZE, ocr_concurrency=BATCH_OCR_CONCURRENCY):
+        self._collection = collection
+        self.write_size = write_size
+        # Shared by all workers: BATCH_WORKERS x write_size documents of up
+        # to OCR_WORKERS pages each would otherwise fill the OCR queue
+        self.ocr_slots = asyncio.Semaphore(ocr_concurrency)
+        self._wakeup = asyncio.Event()
+        self._workers = []
+        # time.monotonic() after which a worker looks for stale claims again
+        self._next_requeue = 0.0
+
+    @property
+    def collection(self):
+        return self._collection if self._collection is not None else get_repo().jobs
+
+    # -------------------- PRODUCER --------------------
+    async def enqueue(self, user_id, staged):
+        now = datetime.utcnow()
+        job = {
+            "userId": user_id,
+            "status": "queued",
+            "total": len(staged),
+            "processed": 0,
+            "failed": 0,
+            "createdAt": now,
+            "updatedAt": now,
+            "files": [
+                {
+                    "index": i,
+                    "filename": filename,
+                    "file": stored,
+                    "status": "queued",
+                    "docType": None,
+                    "documentId": None,
+                    "pageCount": None,
+                    "processingTimeMs": None,
+                    "error": None,
+                }
+                for i, (filename, stored) in enumerate(staged)
+            ],
+        }
+        result = await self.collection.insert_one(job)
+        self._wakeup.set()
+        return str(result.inserted_id)
+
+    async def get_job(self, job_id, user_id):
+        try:
+            oid = ObjectId(job_id)
+        except InvalidId:
+            return None
+        job = await self.collection.find_one({"_id": oid, "userId": user_id}, {"files.file.path": 0})
+        if job:
+            job["_id"] = str(job["_id"])
+        return job
+
+    # -------------------- CONSUMER --------------------
+    async def claim(self):
+        """Atomically mark the next queued file as processing and return (job, file)."""
+        while True:
+            job = await self.collection.find_one(
+                {"status": {"$in": ["queued", "processing"]}, "files.status": "queued"},
+                {"userId": 1, "files.index": 1, "files.status": 1},
+                sort=[("createdAt", 1)],
+            )
+            if job is None:
+                return None, None
+            index = next(f["index"] for f in job["files"] if f["status"] == "queued")
+            now = datetime.utcnow()
+            # Only succeeds if no other worker took this file since the read above
+            claimed = await self.collection.find_one_and_update(
+                {"_id": job["_id"], f"files.{index}.status": "queued"},
+                {"$set": {
+                    "status": "processing",
+                    "updatedAt": now,
+                    f"files.{index}.status": "processing",
+                    f"files.{index}.claimedAt": now,
+                }},
+                return_document=ReturnDocument.AFTER,
+            )
+            if claimed is not None:
+                return claimed, claimed["files"][index]
+
+    async def release(self, job_id, index):
+        await self.collection.update_one(
+            {"_id": job_id},
+            {"$set": {f"files.{index}.status": "queued", f"files.{index}.claimedAt": None}},
+        )
+
+    async def finish(self, job_id, index, fields, failed=False):
+        prefix = f"files.{index}."
+        update = {"$set": {prefix + k: v for k, v in fields.items()}}
+        update["$set"][prefix + "status"] = "failed" if failed else "done"
+        update["$set"]["updatedAt"] = datetime.utcnow()
+        update["$inc"] = {"failed" if failed else "processed": 1}
+        job = await self.collection.find_one_and_update(
+            {"_id": job_id}, update, projection={"total": 1, "processed": 1, "failed": 1},
+            return_document=ReturnDocument.AFTER,
+        )
+        if job and job["processed"] + job["failed"] >= job["total"]:
+            await self.collection.update_one(
+                {"_id": job_id, "status": "processing"},
+                {"$set": {"status": "completed", "completedAt": datetime.utcnow()}},
+            )
+
+    async def requeue_stale(self):
+        # Files left in "processing" by a worker that died are handed out again
+        cutoff = datetime.utcnow() - timedelta(seconds=BATCH_CLAIM_TIMEOUT)
+        stale = {"status": "processing", "claimedAt": {"$lt": cutoff}}
+        async for job in self.collection.find({"status": "processing", "files": {"$elemMatch": stale}}):
+            for item in job["files"]:
+                if item["status"] == "processing" and item.get("claimedAt") and item["claimedAt"] < cutoff:
+                    await self.release(job["_id"], item["index"])
+
+    async def _write(self, built):
+        """Bulk insert [(job, item, (record, kyc))]; returns an error (or None) per entry."""
+        repo = get_repo()
+        try:
+            with stage_timer("db_bulk_write"):
+                await repo.insert_documents([pair for _, _, pair in built])
+            return [None] * len(built)
+        except Exception:
+            # Find the documents at fault by writing them one at a time
+            errors = []
+            for _, _, pair in built:
+                try:
+                    await repo.insert_document(*pair)
+                    errors.append(None)
+                except Exception as e:
+                    errors.append(e)
+            return errors
+
+    async def process_batch(self):
+        """Claim up to ``write_size`` files, OCR them together and write them in bulk."""
+        claimed = []
+        while len(claimed) < self.write_size:
+            job, item = await self.claim()
+            if job is None:
+                break
+            claimed.append((job, item))
+        if not claimed:
+            return False
+
+        results = await asyncio.gather(
+            *(build_document(item["file"], item["filename"], job["userId"], ocr_slots=self.ocr_slots)
+              for job, item in claimed),
+            return_exceptions=True,
+        )
+        built, backoff = [], False
+        for (job, item), result in zip(claimed, results):
+            if isinstance(result, OCRQueueFull):
+                # The /upload/ path has the pool busy; put the file back and back off
+                await self.release(job["_id"], item["index"])
+                backoff = True
+            elif isinstance(result, Exception):
+                FAILURES.inc(source="batch", reason=type(result).__name__)
+                await self.finish(job["_id"], item["index"], {"error": str(result)}, failed=True)
+            else:
+                built.append((job, item, result))
+
+        errors = await self._write(built) if built else []
+        await image_index.insert([record for (_, _, (record, _)), error in zip(built, errors) if error is None])
+        for (job, item, (record, _)), error in zip(built, errors):
+            if error is not None:
+                FAILURES.inc(source="batch", reason=type(error).__name__)
+                await self.finish(job["_id"], item["index"], {"error": str(error)}, failed=True)
+                continue
+            DOCUMENTS.inc(doc_type=record["docType"], source="batch")
+            await self.finish(job["_id"], item["index"], {
+                "docType": record["docType"],
+                "documentId": str(record["_id"]),
+                "pageCount": record["pageCount"],
+                "processingTimeMs": record["processingTimeMs"],
+            })
+        if backoff:
+            await asyncio.sleep(BATCH_POLL_INTERVAL)
+        return True
+
+    async def _requeue_due(self):
+        # One worker at a time re-queues the claims of files whose batch
+        # failed after claiming (e.g. finish() hit a Mongo error)
+        now = time.monotonic()
+        if now < self._next_requeue:
+            return
+        self._next_requeue = now + BATCH_CLAIM_TIMEOUT / 2
+        await self.requeue_stale()
+
+    async def _worker(self):
+        while True:
+            try:
+                await self._requeue_due()
+                if await self.process_batch():
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Mongo hiccup: wait for the next poll rather than killing the worker
+                pass
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), BATCH_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def start(self, workers=BATCH_WORKERS):
+        await self.requeue_stale()
+        self._next_requeue = time.monotonic() + BATCH_CLAIM_TIMEOUT / 2
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(workers)]
+
+    async def stop(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+
+batch_queue = BatchQueue()
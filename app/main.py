@@ -1,19 +1,34 @@
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Depends
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Depends, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
+from fastapi.encoders import jsonable_encoder
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from pymongo import MongoClient
+from pymongo.errors import DuplicateKeyError
+from bson import ObjectId
+from bson.errors import InvalidId
 from passlib.context import CryptContext
 from fastapi.openapi.utils import get_openapi
+from contextlib import asynccontextmanager
+from typing import List, Optional
 import jwt
-import pytesseract
-from PIL import Image
-import io
+import asyncio
 import re
 import time
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 import os
 
+from .cache import ocr_cache, principal_cache
+from .config import AUTH_TRUST_TOKEN_CLAIMS, DOCUMENT_MAX_PAGES, OCR_WORKERS, OCR_QUEUE_DEPTH
+from . import profiling
+from . import db
+from .documents import open_page, stream_page, InvalidCursor
+from .fraud import image_index
+from .jobs import batch_queue, stage_uploads
+from .metrics import REGISTRY, Counter, Gauge, FAILURES, HTTP_REQUESTS, HTTP_SECONDS, PROFILES, stage_timer
+from .ocr import start_executor, shutdown_executor, pending_jobs, OCRQueueFull, OCRUnavailable
+from .pipeline import process_document
+from .utils import store_uploads, UploadRejected, DOCUMENT_TYPES
+
 # -------------------- LOAD CONFIG --------------------
 load_dotenv()
 
@@ -22,7 +37,42 @@ ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 1440))
 
 # -------------------- FASTAPI INIT --------------------
-app = FastAPI(title="KYC Verification API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if profiling.enabled():
+        # Fail at startup rather than on the first sampled request
+        profiling.profiler_name()
+    start_executor()
+    await db.connect()
+    await image_index.start()
+    await batch_queue.start()
+    yield
+    await batch_queue.stop()
+    await image_index.stop()
+    db.close()
+    shutdown_executor()
+
+app = FastAPI(title="KYC Verification API", lifespan=lifespan)
+
+# -------------------- METRICS / PROFILING --------------------
+@app.middleware("http")
+async def observe_request(request: Request, call_next):
+    start = time.perf_counter()
+    profile = profiling.start_profile(request)
+    try:
+        response = await call_next(request)
+    finally:
+        if profile:
+            profile.stop()
+    elapsed = time.perf_counter() - start
+    # The route template, not the raw path, so job ids don't each get a series
+    route = getattr(request.scope.get("route"), "path", "unmatched")
+    HTTP_REQUESTS.inc(method=request.method, route=route, status=str(response.status_code))
+    HTTP_SECONDS.observe(elapsed, method=request.method, route=route)
+    if profile:
+        response.headers["X-Profile-Id"] = profile.save(request.method, route, elapsed * 1000)
+        PROFILES.inc(route=route)
+    return response
 
 # ✅ Custom Swagger (fix for KeyError)
 def custom_openapi():
@@ -54,13 +104,6 @@ def custom_openapi():
 
 app.openapi = custom_openapi
 
-# -------------------- DATABASE --------------------
-client = MongoClient("mongodb://localhost:27017/")
-db = client["kyc_database"]
-users_collection = db["users"]
-documents_collection = db["uploaded_documents"]
-kyc_data_collection = db["kyc_data"]
-
 # -------------------- SECURITY --------------------
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
@@ -79,16 +122,31 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-def get_current_user(token: str = Depends(oauth2_scheme)):
+def _user_from_claims(payload):
+    try:
+        return {"_id": ObjectId(payload["uid"]), "email": payload["sub"], "name": payload.get("name")}
+    except (KeyError, InvalidId, TypeError):
+        return None
+
+async def get_current_user(token: str = Depends(oauth2_scheme)):
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email = payload.get("sub")
         if not email:
             raise HTTPException(status_code=401, detail="Invalid token payload")
 
-        user = users_collection.find_one({"email": email})
-        if not user:
-            raise HTTPException(status_code=401, detail="User not found")
+        if AUTH_TRUST_TOKEN_CLAIMS:
+            user = _user_from_claims(payload)
+            if user:
+                principal_cache.claims += 1
+                return user
+
+        user = principal_cache.get(email)
+        if user is None:
+            user = await db.get_repo().users.find_one({"email": email}, {"password": 0})
+            if not user:
+                raise HTTPException(status_code=401, detail="User not found")
+            principal_cache.set(email, user)
 
         return user
     except jwt.ExpiredSignatureError:
@@ -106,7 +164,7 @@ def is_valid_password(password: str) -> bool:
 
 # -------------------- AUTH ROUTES --------------------
 @app.post("/signup", tags=["Authentication"])
-def signup(name: str = Form(...), email: str = Form(...), password: str = Form(...)):
+async def signup(name: str = Form(...), email: str = Form(...), password: str = Form(...)):
     if not is_valid_email(email):
         raise HTTPException(status_code=400, detail="Invalid email format")
     if not is_valid_password(password):
@@ -114,120 +172,130 @@ def signup(name: str = Form(...), email: str = Form(...), password: str = Form(.
             status_code=400,
             detail="Password must be 8–16 chars, include uppercase, lowercase, number, and special char.",
         )
-    if users_collection.find_one({"email": email}):
+    users = db.get_repo().users
+    if await users.find_one({"email": email}, {"_id": 1}):
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    users_collection.insert_one({
-        "name": name,
-        "email": email,
-        "password": hash_password(password),
-        "createdAt": datetime.utcnow()
-    })
+    try:
+        await users.insert_one({
+            "name": name,
+            "email": email,
+            # bcrypt is deliberately slow; keep it off the event loop
+            "password": await asyncio.to_thread(hash_password, password),
+            "createdAt": datetime.utcnow()
+        })
+    except DuplicateKeyError:
+        # Lost a race with a concurrent signup for the same email
+        raise HTTPException(status_code=400, detail="Email already registered")
+    principal_cache.invalidate(email)
     return {"message": "Signup successful"}
 
 @app.post("/login", tags=["Authentication"])
-def login(form_data: OAuth2PasswordRequestForm = Depends()):
-    user = users_collection.find_one({"email": form_data.username})
+async def login(form_data: OAuth2PasswordRequestForm = Depends()):
+    user = await db.get_repo().users.find_one({"email": form_data.username})
     if not user:
         raise HTTPException(status_code=401, detail="Invalid email")
-    if not verify_password(form_data.password, user["password"]):
+    if not await asyncio.to_thread(verify_password, form_data.password, user["password"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
-    token = create_access_token({"sub": user["email"]})
+    token = create_access_token({"sub": user["email"], "uid": str(user["_id"]), "name": user.get("name")})
     return {"access_token": token, "token_type": "bearer"}
 
-# -------------------- OCR PARSER --------------------
-def parse_text(text: str):
-    parsed = {
-        "panNumber": None,
-        "aadhaarNumber": None,
-        "name": None,
-        "fatherName": None,
-        "dob": None,
-        "gender": None,
-        "address": None,
-    }
-
-    lines = [line.strip() for line in text.splitlines() if line.strip()]
-    full_text = "\n".join(lines)
-
-    aadhaar = re.search(r"\b\d{4}\s\d{4}\s\d{4}\b", full_text)
-    if aadhaar:
-        parsed["aadhaarNumber"] = aadhaar.group().replace(" ", "")
-
-    pan = re.search(r"\b[A-Z]{5}[0-9]{4}[A-Z]\b", full_text)
-    if pan:
-        parsed["panNumber"] = pan.group()
-
-    dob = re.search(r"(\d{2,4}[-/]\d{2}[-/]\d{2,4})", full_text)
-    if dob:
-        parsed["dob"] = dob.group(1)
-
-    gender = re.search(r"(?i)\b(male|female|transgender)\b", full_text)
-    if gender:
-        parsed["gender"] = gender.group(1).capitalize()
-
-    name_match = re.search(r"(?i)\bname[:\-]?\s*([A-Za-z\s]+?)(?=\s*(dob|father|date|gender|address|$))", full_text)
-    if name_match:
-        parsed["name"] = name_match.group(1).strip()
-
-    return parsed
-
 # -------------------- UPLOAD DOC --------------------
 @app.post("/upload/", tags=["KYC Operations"])
 async def upload_image(
     file: UploadFile = File(...),
+    pages: Optional[List[UploadFile]] = File(None, description="Further pages of the same document, e.g. the back of the card"),
     user: dict = Depends(get_current_user)
 ):
+    pages = pages or []
+    if 1 + len(pages) > DOCUMENT_MAX_PAGES:
+        FAILURES.inc(source="upload", reason="UploadTooLarge")
+        raise HTTPException(status_code=413, detail=f"A document may have at most {DOCUMENT_MAX_PAGES} pages")
     try:
-        start_time = time.time()
-        contents = await file.read()
-        image = Image.open(io.BytesIO(contents))
-
-        text = pytesseract.image_to_string(image)
-        parsed = parse_text(text)
-
-        if parsed["aadhaarNumber"]:
-            doc_type = "Aadhaar"
-        elif parsed["panNumber"]:
-            doc_type = "PAN"
-        else:
-            doc_type = "UNKNOWN"
-
-        record = {
-            "userId": str(user["_id"]),
-            "filename": file.filename,
-            "docType": doc_type,
-            "rawText": text,
-            "parsed": parsed,
-            "processingTimeMs": int((time.time() - start_time) * 1000),
-            "uploadedAt": datetime.utcnow().isoformat(),
-        }
-
-        record_id = documents_collection.insert_one(record).inserted_id
-        record["_id"] = str(record_id)
-
-        kyc_data_collection.insert_one({
-            "userId": str(user["_id"]),
-            "docType": doc_type,
-            "parsedData": parsed,
-            "createdAt": datetime.utcnow().isoformat(),
-        })
-
-        return JSONResponse(content=record)
+        with stage_timer("store"):
+            stored, *extra_files = await store_uploads([file, *pages], allowed=DOCUMENT_TYPES)
+        record = await process_document(stored, file.filename, str(user["_id"]), extra_files)
+        with stage_timer("serialize"):
+            return JSONResponse(content=record)
+    except UploadRejected as e:
+        FAILURES.inc(source="upload", reason=type(e).__name__)
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except OCRQueueFull:
+        FAILURES.inc(source="upload", reason="OCRQueueFull")
+        raise HTTPException(status_code=429, detail="OCR queue is full, retry later", headers={"Retry-After": "1"})
+    except OCRUnavailable as e:
+        FAILURES.inc(source="upload", reason="OCRUnavailable")
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
+        FAILURES.inc(source="upload", reason=type(e).__name__)
         raise HTTPException(status_code=500, detail=str(e))
 
+# -------------------- BATCH UPLOAD --------------------
+@app.post("/api/batch-upload", status_code=202, tags=["KYC Operations"])
+async def batch_upload(
+    files: List[UploadFile] = File(...),
+    user: dict = Depends(get_current_user)
+):
+    user_id = str(user["_id"])
+    try:
+        staged = await stage_uploads(files)
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    if not staged:
+        raise HTTPException(status_code=400, detail="No image or PDF files found in the upload")
+
+    job_id = await batch_queue.enqueue(user_id, staged)
+    return {"jobId": job_id, "status": "queued", "total": len(staged)}
+
+@app.get("/api/batch-upload/{job_id}", tags=["KYC Operations"])
+async def batch_status(job_id: str, user: dict = Depends(get_current_user)):
+    job = await batch_queue.get_job(job_id, str(user["_id"]))
+    if not job:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    return JSONResponse(content=jsonable_encoder(job))
+
 # -------------------- FETCH DOCS --------------------
 @app.get("/api/get-user-docs", tags=["KYC Operations"])
-async def get_user_docs(current_user: dict = Depends(get_current_user)):
-    docs = list(documents_collection.find({"userId": str(current_user["_id"])}))
-    if not docs:
+async def get_user_docs(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="nextCursor from the previous page"),
+    docType: Optional[str] = Query(None),
+    includeRaw: bool = Query(False, description="Include the OCR rawText of each document"),
+    current_user: dict = Depends(get_current_user)
+):
+    try:
+        docs = open_page(str(current_user["_id"]), limit, cursor, docType, includeRaw)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    first = await anext(docs, None)
+    if first is None and not cursor:
         raise HTTPException(status_code=404, detail="No documents found for this user")
 
-    for doc in docs:
-        doc["_id"] = str(doc["_id"])
-    return {"user": current_user["email"], "documents": docs}
+    header = {"user": current_user["email"]}
+    return StreamingResponse(stream_page(header, first, docs, limit), media_type="application/json")
+
+# -------------------- STATS --------------------
+@app.get("/stats", tags=["Monitoring"])
+def stats():
+    return {"ocrCache": ocr_cache.stats(), "principalCache": principal_cache.stats(), "imageIndex": image_index.stats()}
+
+Gauge("kyc_ocr_pending_jobs", "OCR jobs submitted to the worker pool and not finished.", collect=pending_jobs)
+Gauge("kyc_ocr_queue_capacity", "Pending OCR jobs allowed before /upload/ returns 429.",
+      collect=lambda: OCR_WORKERS + OCR_QUEUE_DEPTH)
+Counter("kyc_ocr_cache_lookups_total", "OCR cache lookups since start, by result.", ["result"], collect=lambda: {
+    ("memory_hit",): ocr_cache.memory_hits, ("mongo_hit",): ocr_cache.mongo_hits, ("miss",): ocr_cache.misses,
+})
+Gauge("kyc_image_index_entries", "Page hashes in this process's near-duplicate index.", collect=lambda: len(image_index))
+Counter("kyc_principal_cache_lookups_total", "Authenticated-user cache lookups since start, by result.", ["result"], collect=lambda: {
+    ("hit",): principal_cache.hits, ("miss",): principal_cache.misses, ("claims",): principal_cache.claims,
+})
+
+
+@app.get("/metrics", tags=["Monitoring"], response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
 
 # -------------------- ROOT --------------------
 @app.get("/", tags=["Root"])
@@ -0,0 +1,252 @@
+"""In-process metrics rendered in the Prometheus text format on /metrics.
+
+Counters, gauges and histograms are kept in this process only (no client
+library); with several uvicorn workers each one reports its own series.
+Values may be updated from any thread: pymongo calls the pool and command
+listeners below from its own threads.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+from pymongo import monitoring
+
+# Upper bounds in seconds; OCR runs take hundreds of ms, Mongo commands a few
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """Base for the metric types.
+
+    ``collect``, if given, computes the values at scrape time instead: it
+    returns a number, or {label values tuple: number} for a labelled metric.
+    """
+
+    type = None
+
+    def __init__(self, name, help, labels=(), registry=None, collect=None):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.collect = collect
+        self._values = {}
+        self._lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} expects labels {self.labels}, got {tuple(labels)}")
+        return tuple(labels[name] for name in self.labels)
+
+    def samples(self):
+        """[(suffix, label values, extra label, value)] for rendering."""
+        if self.collect is not None:
+            values = self.collect()
+            if not isinstance(values, dict):
+                values = {(): values}
+        else:
+            with self._lock:
+                values = dict(self._values)
+        return [("", key, "", value) for key, value in sorted(values.items())]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for suffix, key, extra, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(self.labels, key, extra)} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, help, labels=(), registry=None, buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels, registry)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                # Per-bucket (non-cumulative) counts, then sum
+                series = self._values[key] = [[0] * len(self.buckets), 0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        samples = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                samples.append(("_bucket", key, f'le="{_format_value(float(bound))}"', cumulative))
+            samples.append(("_sum", key, "", round(total, 6)))
+            samples.append(("_count", key, "", cumulative))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+
+    def render(self):
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+REGISTRY = Registry()
+
+# -------------------- APPLICATION METRICS --------------------
+STAGE_SECONDS = Histogram(
+    "kyc_stage_seconds",
+    "Time spent in each document processing stage (OCR worker stages, queueing, parsing, DB writes).",
+    ["stage"],
+)
+HTTP_REQUESTS = Counter("kyc_http_requests_total", "HTTP requests by route and status.", ["method", "route", "status"])
+HTTP_SECONDS = Histogram("kyc_http_request_seconds", "HTTP request latency until the response starts.", ["method", "route"])
+DOCUMENTS = Counter("kyc_documents_total", "Documents processed, by detected type.", ["doc_type", "source"])
+DOCUMENT_PAGES = Counter("kyc_document_pages_total", "Pages OCR'd, by whether the OCR cache answered.", ["cached"])
+FAILURES = Counter("kyc_document_failures_total", "Documents that could not be processed.", ["source", "reason"])
+FRAUD_FLAGS = Counter(
+    "kyc_fraud_flags_total", "Uploads flagged by fraud screening, by flag (one upload may raise several).", ["flag"],
+)
+PROFILES = Counter("kyc_profiles_total", "Requests profiled and dumped to PROFILE_DIR.", ["route"])
+
+
+@contextmanager
+def stage_timer(stage):
+    """Observe the wall time of the ``with`` block as ``stage`` (awaits included)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage)
+
+
+def observe_stage_timings(timings):
+    """Record a {stage: milliseconds} dict as reported by the OCR workers."""
+    for stage, ms in timings.items():
+        STAGE_SECONDS.observe(ms / 1000, stage=stage)
+
+
+# -------------------- MONGODB --------------------
+MONGO_CONNECTIONS = Gauge("kyc_mongo_pool_connections", "Open connections per MongoDB server.", ["address"])
+MONGO_CHECKED_OUT = Gauge("kyc_mongo_pool_checked_out", "Connections currently checked out of the pool.", ["address"])
+MONGO_CHECKOUT_SECONDS = Histogram(
+    "kyc_mongo_pool_checkout_seconds", "Time spent waiting for a pooled connection.", ["address"],
+)
+MONGO_CHECKOUT_FAILURES = Counter(
+    "kyc_mongo_pool_checkout_failures_total", "Connection checkouts that failed.", ["address", "reason"],
+)
+MONGO_COMMAND_SECONDS = Histogram("kyc_mongo_command_seconds", "MongoDB command latency.", ["command"])
+MONGO_COMMAND_FAILURES = Counter("kyc_mongo_command_failures_total", "MongoDB commands that failed.", ["command"])
+
+
+def _address(event):
+    host, port = event.address
+    return f"{host}:{port}"
+
+
+class MongoPoolMetrics(monitoring.ConnectionPoolListener):
+    """Connection pool gauges, registered on the Motor client in app/db.py."""
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        MONGO_CONNECTIONS.inc(address=_address(event))
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        MONGO_CONNECTIONS.dec(address=_address(event))
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        MONGO_CHECKOUT_FAILURES.inc(address=_address(event), reason=str(event.reason))
+
+    def connection_checked_out(self, event):
+        MONGO_CHECKED_OUT.inc(address=_address(event))
+        if event.duration is not None:
+            MONGO_CHECKOUT_SECONDS.observe(event.duration, address=_address(event))
+
+    def connection_checked_in(self, event):
+        MONGO_CHECKED_OUT.dec(address=_address(event))
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Per-command latency, so slow inserts show up apart from OCR time."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_COMMAND_SECONDS.observe(event.duration_micros / 1e6, command=event.command_name)
+
+    def failed(self, event):
+        MONGO_COMMAND_SECONDS.observe(event.duration_micros / 1e6, command=event.command_name)
+        MONGO_COMMAND_FAILURES.inc(command=event.command_name)
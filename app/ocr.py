@@ -1,77 +1,211 @@
-import re
+import asyncio
+import io
+import mmap
+import multiprocessing
+import time
 import pytesseract
 from PIL import Image
-from .config import TESSERACT_CMD
-from concurrent.futures import ThreadPoolExecutor
-
-if TESSERACT_CMD:
-    pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
-
-_executor = ThreadPoolExecutor(max_workers=2)
-
-def run_ocr_sync(path):
-    img = Image.open(path)
-    text = pytesseract.image_to_string(img, lang='eng')
-    return text
-
-async def run_ocr(path):
-    # Run blocking OCR in threadpool
-    loop = __import__("asyncio").get_event_loop()
-    return await loop.run_in_executor(_executor, run_ocr_sync, path)
-
-def parse_kyc(text):
-    lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
-    joined = " ".join(lines)
-
-    # PAN: pattern 5 letters 4 digits 1 letter
-    pan_match = re.search(r'\b([A-Z]{5}[0-9]{4}[A-Z])\b', joined, re.IGNORECASE)
-    pan = pan_match.group(1).upper() if pan_match else None
-
-    # Aadhaar: 12 digits (allow spaces)
-    aadhaar_match = re.search(r'\b(\d{4}\s?\d{4}\s?\d{4})\b', joined)
-    if aadhaar_match:
-        aadhaar = re.sub(r'\s+', '', aadhaar_match.group(1))
-    else:
-        aadhaar = None
-
-    # DOB: dd/mm/yyyy or yyyy-mm-dd
-    dob_match = re.search(r'\b(\d{2}/\d{2}/\d{4})\b', joined) or re.search(r'\b(\d{4}-\d{2}-\d{2})\b', joined)
-    dob = dob_match.group(1) if dob_match else None
-
-    # Gender
-    gender = None
-    g = re.search(r'\b(Male|Female|MALE|FEMALE|M|F)\b', joined)
-    if g:
-        gender = g.group(1)
-
-    # Name heuristics: look for lines with uppercase names near PAN or at top
-    name = None
-    father_name = None
-    # If PAN present, often name is on line above PAN or prominent in lines
-    if pan:
-        for i, ln in enumerate(lines):
-            if pan in ln.replace(" ", ""):
-                if i > 0:
-                    name = lines[i-1]
-                break
-    if not name and lines:
-        name = lines[0]
-
-    # Address heuristic: capture lines after 'Address' keyword
-    address = None
-    for i, ln in enumerate(lines):
-        if ln.lower().startswith("address") or "address" in ln.lower():
-            address = " ".join(lines[i+1:i+5])
-            break
-
-    parsed = {
-        "panNumber": pan,
-        "aadhaarNumber": aadhaar,
-        "name": name,
-        "fatherName": father_name,
-        "dob": dob,
-        "gender": gender,
-        "address": address
-    }
-
-    return parsed
+from .config import (
+    OCR_WORKERS, OCR_QUEUE_DEPTH, OCR_LANG, OCR_PSM, TEMPLATES_ENABLED, EXTRACT_VERIFY_CHECKSUMS,
+    PREPROCESS_STAGES, PDF_RENDER_DPI, PDF_MAX_PAGE_PIXELS,
+)
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from .ocr_backends import get_backend, backend_name
+from .metrics import STAGE_SECONDS, observe_stage_timings
+from .pdf import render_page
+from .phash import dhash, to_hex, PHASH_VERSION
+from .preprocess import preprocess, preprocess_version, parse_stages
+from .templates import match_template, TEMPLATE_VERSION
+
+
+class OCRQueueFull(Exception):
+    """More OCR jobs are pending than OCR_WORKERS + OCR_QUEUE_DEPTH allows."""
+
+
+class OCRUnavailable(Exception):
+    """The OCR worker pool died or could not be started."""
+
+
+# Rendered PDF pages carry no EXIF and are already at PDF_RENDER_DPI
+PAGE_SKIP_STAGES = frozenset({"exif", "resize"})
+
+
+_executor = None
+# Jobs submitted to the pool and not yet finished. Only touched from the event
+# loop thread, so a plain int is enough.
+_pending = 0
+
+
+def _mp_context():
+    # Not fork: the API process runs threads (asyncio.to_thread, Motor), and
+    # a worker forked while one of them holds a lock, e.g. pdf._PDFIUM_LOCK
+    # in page_count, would inherit it held and hang on its first PDF page.
+    # The pool is started lazily and again after a crash, so that can happen
+    # at any time.
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=OCR_WORKERS, mp_context=_mp_context())
+    return _executor
+
+
+def _warm_worker():
+    # Loads the OCR engine (and its language data) in the worker process
+    return get_backend().name
+
+
+def start_executor():
+    # Resolve OCR_BACKEND=auto for the OCR cache key now rather than on the
+    # first upload; each worker resolves it the same way
+    backend_name()
+    # Spawn the workers up front so the first upload doesn't pay for it
+    executor = _get_executor()
+    for _ in range(OCR_WORKERS):
+        executor.submit(_warm_worker)
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def pending_jobs():
+    return _pending
+
+
+def ocr_settings(pdf_page=False):
+    # Everything besides the image bytes that changes the OCR output
+    # Template anchors are validated with the extraction checksums
+    templates = f"{TEMPLATE_VERSION}/checks{int(EXTRACT_VERIFY_CHECKSUMS)}" if TEMPLATES_ENABLED else "off"
+    settings = (
+        f"backend={backend_name()};lang={OCR_LANG};psm={OCR_PSM};"
+        f"preprocess={preprocess_version()};templates={templates}"
+        # Not OCR output, but cached with it
+        f";phash={PHASH_VERSION}"
+    )
+    if pdf_page:
+        settings += f";pdf_dpi={PDF_RENDER_DPI};pdf_max_px={PDF_MAX_PAGE_PIXELS}"
+    return settings
+
+
+def _elapsed_ms(start):
+    return round((time.perf_counter() - start) * 1000, 2)
+
+
+def _decode(source, page=None):
+    # Paths are memory-mapped so the worker reads the stored file directly
+    # instead of receiving a pickled copy of the upload
+    if page is not None:
+        return render_page(source, page)
+    if isinstance(source, (bytes, bytearray)):
+        img = Image.open(io.BytesIO(source))
+        img.load()
+        return img
+    with open(source, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        img = Image.open(mm)
+        img.load()
+        return img
+
+
+def run_ocr_sync(source, stages=None, templates=TEMPLATES_ENABLED, page=None):
+    """Decode, preprocess and OCR one image (a file path or raw bytes).
+
+    With ``page`` set, ``source`` is a PDF path and only that page (0-based)
+    is rendered. Returns {"text", "phash", "timings"} plus "template",
+    "confidence" and "fields" when a document template matched and only its
+    field boxes were OCR'd. "phash" is the perceptual hash (hex) of the
+    decoded image, taken before preprocessing so the settings don't change it.
+
+    Raises OCRUnavailable when there is no tesseract binary.
+    """
+    try:
+        return _run_ocr_sync(source, stages, templates, page)
+    except pytesseract.TesseractNotFoundError as e:
+        # Raised in an OCR worker, directly or from a template thread.
+        # TesseractNotFoundError can't be unpickled in the parent, which
+        # would then report the whole pool as broken
+        raise OCRUnavailable("Tesseract binary not found") from e
+
+
+def _run_ocr_sync(source, stages, templates, page):
+    start = time.perf_counter()
+    img = _decode(source, page)
+    timings = {"render" if page is not None else "decode": _elapsed_ms(start)}
+
+    start = time.perf_counter()
+    image_hash = to_hex(dhash(img))
+    timings["phash"] = _elapsed_ms(start)
+
+    if page is not None and stages is None:
+        stages = [name for name in parse_stages(PREPROCESS_STAGES) if name not in PAGE_SKIP_STAGES]
+
+    img, stage_timings = preprocess(img, stages)
+    timings.update(stage_timings)
+
+    if templates:
+        start = time.perf_counter()
+        matched = match_template(img)
+        timings["template"] = _elapsed_ms(start)
+        if matched:
+            matched["timings"] = timings
+            matched["phash"] = image_hash
+            return matched
+
+    start = time.perf_counter()
+    text = get_backend().image_to_string(img, psm=OCR_PSM)
+    timings["ocr"] = _elapsed_ms(start)
+    return {"text": text, "phash": image_hash, "timings": timings}
+
+
+async def run_ocr(source, page=None):
+    # Run blocking OCR in the process pool, refusing work once the queue is full
+    global _executor, _pending
+    if _pending >= OCR_WORKERS + OCR_QUEUE_DEPTH:
+        raise OCRQueueFull(f"{_pending} OCR jobs already pending")
+    _pending += 1
+    loop = asyncio.get_running_loop()
+    future = None
+    try:
+        start = time.perf_counter()
+        executor = _get_executor()
+        future = executor.submit(run_ocr_sync, source, page=page)
+        result = await asyncio.wrap_future(future)
+        elapsed = time.perf_counter() - start
+        observe_stage_timings(result["timings"])
+        # Whatever the worker didn't account for was spent waiting for a free
+        # worker and pickling the job and result across the process boundary
+        worker_seconds = sum(result["timings"].values()) / 1000
+        STAGE_SECONDS.observe(max(elapsed - worker_seconds, 0.0), stage="ocr_queue")
+        return result
+    except BrokenProcessPool as e:
+        # A worker crashed; drop the pool so the next call starts a fresh one.
+        # Other jobs on the same pool fail too, possibly after a newer call
+        # already replaced it: only the first of them resets, and only its pool.
+        if _executor is executor:
+            _executor = None
+            executor.shutdown(wait=False, cancel_futures=True)
+        raise OCRUnavailable("OCR worker pool is unavailable") from e
+    finally:
+        if future is None or future.cancel() or future.done():
+            _pending -= 1
+        else:
+            # Cancelled while a worker runs the job: it still holds that
+            # worker, so it counts as pending until it finishes
+            future.add_done_callback(lambda _: _job_done(loop))
+
+
+def _job_done(loop):
+    # Called from the executor's thread
+    def release():
+        global _pending
+        _pending -= 1
+
+    if not loop.is_closed():
+        loop.call_soon_threadsafe(release)
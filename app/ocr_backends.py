@@ -0,0 +1,136 @@
+"""Pluggable OCR engines behind one ``image_to_string`` call.
+
+``pytesseract`` forks the tesseract binary for every call, writing the image
+to a temp file and reloading the language data each time. ``tesserocr`` binds
+libtesseract directly and keeps an initialised engine per thread for the life
+of the OCR worker process, so only recognition itself is paid per call.
+OCR_BACKEND picks one; "auto" prefers tesserocr when it is installed and
+starts.
+"""
+import functools
+import importlib.util
+import threading
+
+import pytesseract
+
+from .config import OCR_BACKEND, OCR_LANG, OCR_PSM, TESSERACT_CMD, TESSDATA_PREFIX
+
+if TESSERACT_CMD:
+    pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
+
+
+class OCRBackend:
+    name = None
+
+    def image_to_string(self, image, psm=OCR_PSM, whitelist=None):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class PytesseractBackend(OCRBackend):
+    name = "pytesseract"
+
+    def __init__(self, lang=OCR_LANG):
+        self.lang = lang
+
+    def image_to_string(self, image, psm=OCR_PSM, whitelist=None):
+        config = f"--psm {psm}"
+        if whitelist:
+            config += f" -c tessedit_char_whitelist={whitelist}"
+        return pytesseract.image_to_string(image, lang=self.lang, config=config)
+
+
+class TesserocrBackend(OCRBackend):
+    name = "tesserocr"
+
+    def __init__(self, lang=OCR_LANG):
+        import tesserocr
+
+        self._tesserocr = tesserocr
+        self.lang = lang
+        # A PyTessBaseAPI must not be shared between threads, and template
+        # crops are OCR'd from a thread pool
+        self._local = threading.local()
+        self._apis = []
+        self._lock = threading.Lock()
+        self._api()
+
+    def _api(self):
+        api = getattr(self._local, "api", None)
+        if api is None:
+            kwargs = {"lang": self.lang}
+            if TESSDATA_PREFIX:
+                kwargs["path"] = TESSDATA_PREFIX
+            api = self._tesserocr.PyTessBaseAPI(**kwargs)
+            self._local.api = api
+            with self._lock:
+                self._apis.append(api)
+        return api
+
+    def image_to_string(self, image, psm=OCR_PSM, whitelist=None):
+        api = self._api()
+        api.SetPageSegMode(psm)
+        api.SetVariable("tessedit_char_whitelist", whitelist or "")
+        api.SetImage(image)
+        try:
+            return api.GetUTF8Text()
+        finally:
+            # Drops the image and results but keeps the language data loaded
+            api.Clear()
+
+    def close(self):
+        with self._lock:
+            for api in self._apis:
+                api.End()
+            self._apis = []
+
+
+BACKENDS = {
+    "pytesseract": PytesseractBackend,
+    "tesserocr": TesserocrBackend,
+}
+
+
+def available_backends():
+    names = ["pytesseract"]
+    if importlib.util.find_spec("tesserocr") is not None:
+        names.append("tesserocr")
+    return names
+
+
+@functools.cache
+def _resolve_auto():
+    if "tesserocr" not in available_backends():
+        return "pytesseract"
+    try:
+        TesserocrBackend().close()
+    except (ImportError, RuntimeError):
+        # tesserocr present but unusable (e.g. no traineddata): use the CLI
+        return "pytesseract"
+    return "tesserocr"
+
+
+def backend_name(name=OCR_BACKEND):
+    """The backend ``get_backend`` creates for ``name``; part of the OCR cache key.
+
+    "auto" is resolved once per process by starting tesserocr and closing it
+    again, so a tesserocr that is installed but unusable reports pytesseract.
+    """
+    if name == "auto":
+        return _resolve_auto()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown OCR_BACKEND {name!r}; expected auto, {', '.join(BACKENDS)}")
+    return name
+
+
+_backend = None
+
+
+def get_backend():
+    """The process-wide backend, created on first use inside each OCR worker."""
+    global _backend
+    if _backend is None:
+        _backend = BACKENDS[backend_name()]()
+    return _backend
@@ -0,0 +1,64 @@
+"""PDF page counting and rendering.
+
+Pages are rasterised one at a time, each inside the OCR worker that reads
+it, so a multi-page upload never holds more than one rendered page per
+worker in memory and nothing but the file path crosses the process boundary.
+
+PDFium is not thread-safe, so every call into it holds ``_PDFIUM_LOCK``:
+page counting runs on the API process's thread pool, and several uploads
+may count pages at once. The OCR workers are not forked from the API
+process (app/ocr.py), so they never inherit the lock while it is held.
+"""
+import math
+import threading
+
+import pypdfium2 as pdfium
+
+from .config import PDF_RENDER_DPI, PDF_MAX_PAGE_PIXELS
+from .utils import UploadRejected
+
+_PDFIUM_LOCK = threading.Lock()
+
+
+def page_count(path):
+    with _PDFIUM_LOCK:
+        try:
+            pdf = pdfium.PdfDocument(path)
+        except pdfium.PdfiumError as e:
+            raise UploadRejected(f"Could not read PDF: {e}") from e
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+
+
+def render_scale(width, height, dpi=PDF_RENDER_DPI, max_pixels=PDF_MAX_PAGE_PIXELS):
+    """Render scale for a page of ``width`` x ``height`` points, capped at ``max_pixels``."""
+    # PDF user space is 72 units per inch
+    scale = dpi / 72
+    area = width * height
+    if area > 0 and area * scale * scale > max_pixels:
+        scale = math.sqrt(max_pixels / area)
+    return scale
+
+
+def render_page(path, index, dpi=PDF_RENDER_DPI, max_pixels=PDF_MAX_PAGE_PIXELS):
+    """Render page ``index`` (0-based) of the PDF at ``path`` as a grayscale PIL image.
+
+    Pages too large for ``max_pixels`` at ``dpi`` are rendered smaller.
+    """
+    with _PDFIUM_LOCK:
+        pdf = pdfium.PdfDocument(path)
+        try:
+            page = pdf[index]
+            try:
+                scale = render_scale(*page.get_size(), dpi=dpi, max_pixels=max_pixels)
+                bitmap = page.render(scale=scale, grayscale=True)
+                image = bitmap.to_pil()
+                # Copy out of the pdfium buffer before the document is closed
+                image.load()
+                return image.copy()
+            finally:
+                page.close()
+        finally:
+            pdf.close()
@@ -0,0 +1,224 @@
+"""Perceptual hashes of document images and a Hamming-distance index over them.
+
+``dhash`` reduces an image to HASH_BITS bits that survive re-encoding,
+rescaling, palette reduction and brightness changes, so a re-saved or
+resized card lands within a few bits of the original. The common 64-bit
+(8x8) dHash is too coarse for ID cards: cards of one type share a layout and
+differ mostly in small text, and at 8x8 different people's cards hash alike.
+A blank or washed-out page has almost no brighter-than-neighbour cells and
+hashes to (nearly) all zeros like every other blank page; ``informative``
+tells such hashes apart so they are neither indexed nor looked up.
+
+``HashIndex`` finds every stored hash within ``max_distance`` bits of a query
+without a scan (multi-index hashing). Each hash is split into CHUNKS 32-bit
+chunks with one table per chunk. Two hashes ``d`` bits apart differ in at
+most ``d`` chunks, so with ``d < CHUNKS`` they agree exactly on at least
+``CHUNKS - d`` of them, and probing any ``d + 1`` tables finds every match:
+the index probes the tables whose buckets for the query are smallest, which
+keeps chunks every card shares (blank margins, a printed heading) from
+turning the lookup into a scan. For ``d >= CHUNKS`` every table is probed
+with the query chunk and its neighbours within ``d // CHUNKS`` bits.
+"""
+import itertools
+
+import numpy as np
+from PIL import Image
+
+# Part of the OCR cache key, since cached OCR results carry the hash
+PHASH_VERSION = "dhash256-1"
+
+GRID = 16
+HASH_BITS = GRID * GRID
+CHUNK_BITS = 32
+CHUNKS = HASH_BITS // CHUNK_BITS
+# Fewest set (and unset) bits of a hash worth comparing. ID cards set 40 or
+# so, still 25 or more at a tenth of their contrast; an empty page with a
+# ruled border sets 16, a blank one none
+MIN_BITS = 20
+
+# EXIF orientation -> transpose that makes the image upright
+_ORIENTATION = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+
+def dhash(image):
+    """Difference hash: is each cell of a GRID x (GRID + 1) thumbnail brighter than its right neighbour."""
+    transpose = _ORIENTATION.get(image.getexif().get(0x0112))
+    if image.mode not in ("L", "RGB", "RGBA"):
+        # Palette and bilevel images would be resized by nearest neighbour
+        image = image.convert("L")
+    # Area-average down to a square first; the EXIF transpose is then
+    # applied to the thumbnail rather than the full image
+    side = 4 * (GRID + 1)
+    small = image.resize((side, side), Image.Resampling.BOX, reducing_gap=2.0).convert("L")
+    if transpose is not None:
+        small = small.transpose(transpose)
+    pixels = np.asarray(small.resize((GRID + 1, GRID), Image.Resampling.BOX), dtype=np.int16)
+    bits = (pixels[:, :-1] > pixels[:, 1:]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def informative(value):
+    """False for the hash of a blank, uniform or nearly contentless page."""
+    return MIN_BITS <= value.bit_count() <= HASH_BITS - MIN_BITS
+
+
+def to_hex(value):
+    return f"{value:0{HASH_BITS // 4}x}"
+
+
+def from_hex(value):
+    return int(value, 16)
+
+
+def to_bytes(value):
+    return value.to_bytes(HASH_BITS // 8, "big")
+
+
+def from_bytes(value):
+    return int.from_bytes(value, "big")
+
+
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+
+if hasattr(np, "bitwise_count"):  # numpy >= 2.0
+    def _distances(words):
+        return np.bitwise_count(words).sum(axis=1, dtype=np.int32)
+else:
+    _POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def _distances(words):
+        return _POPCOUNT[words.view(np.uint8)].reshape(len(words), -1).sum(axis=1, dtype=np.int32)
+
+
+def _words(value):
+    """A hash as HASH_BITS / 64 little-endian uint64 words."""
+    return np.frombuffer(value.to_bytes(HASH_BITS // 8, "little"), dtype="<u8")
+
+
+def _flip_masks(radius):
+    """Every CHUNK_BITS-bit mask with at most ``radius`` bits set, 0 first."""
+    masks = [0]
+    for r in range(1, radius + 1):
+        for bits in itertools.combinations(range(CHUNK_BITS), r):
+            masks.append(sum(1 << bit for bit in bits))
+    return np.array(masks, dtype=np.uint32)
+
+
+def _grow(column, size):
+    if size <= len(column):
+        return column
+    bigger = np.empty((max(size, 2 * len(column)),) + column.shape[1:], dtype=column.dtype)
+    bigger[:len(column)] = column
+    return bigger
+
+
+class HashIndex:
+    """In-memory multi-index over (hash, owner, document) entries, in numpy arrays.
+
+    Each table is the CHUNK_BITS-bit chunk of every entry, sorted, with the
+    entry numbers in the same order; a bucket is a binary search and a
+    slice. Entries added since the last ``rebuild`` (at most PENDING_MAX of
+    them, then ``needs_rebuild``) are compared with the query directly. An
+    entry costs about 120 bytes (benchmarks/phash_bench.py).
+
+    ``add`` and ``query`` run on the event loop thread; ``rebuild`` may run
+    in another thread meanwhile, since it only reads entries below
+    ``count`` and swaps the new tables in with one assignment.
+    """
+
+    PENDING_MAX = 4096
+
+    def __init__(self, max_distance):
+        self.max_distance = max_distance
+        self._masks = _flip_masks(max_distance // CHUNKS)
+        self._count = 0
+        self._hashes = np.empty((1024, HASH_BITS // 64), dtype="<u8")
+        self._owners = np.empty(1024, dtype=np.uint32)
+        self._documents = np.empty((1024, 12), dtype=np.uint8)
+        self._owner_ids = {}
+        self._owner_names = []
+        # (tables [(sorted chunks, entry numbers)], entries covered)
+        self._main = ([], 0)
+
+    def __len__(self):
+        return self._count
+
+    def add(self, value, owner, document_id):
+        """Index ``value`` (a HASH_BITS-bit int) for ``owner``'s document (a 12-byte ObjectId)."""
+        entry = self._count
+        owner_id = self._owner_ids.get(owner)
+        if owner_id is None:
+            owner_id = self._owner_ids[owner] = len(self._owner_names)
+            self._owner_names.append(owner)
+        if entry == len(self._hashes):
+            self._hashes = _grow(self._hashes, entry + 1)
+            self._owners = _grow(self._owners, entry + 1)
+            self._documents = _grow(self._documents, entry + 1)
+        self._hashes[entry] = _words(value)
+        self._owners[entry] = owner_id
+        self._documents[entry] = np.frombuffer(document_id, dtype=np.uint8)
+        self._count = entry + 1
+
+    def needs_rebuild(self):
+        return self._count - self._main[1] > self.PENDING_MAX
+
+    def rebuild(self, count=None):
+        """Sort the first ``count`` entries (default: all) into the chunk tables."""
+        count = self._count if count is None else count
+        chunks = self._hashes[:count].view("<u4")
+        tables = []
+        for i in range(CHUNKS):
+            order = np.argsort(chunks[:, i], kind="stable").astype(np.uint32)
+            tables.append((chunks[order, i], order))
+        self._main = (tables, count)
+
+    def _candidates(self, query, max_distance):
+        tables, indexed = self._main
+        parts = [np.arange(indexed, self._count, dtype=np.uint32)]
+        if not indexed:
+            return parts
+        chunks = query.view("<u4")
+        if max_distance < CHUNKS:
+            # Exact chunk matches only, from the max_distance + 1 smallest buckets
+            buckets = []
+            for (keys, entries), chunk in zip(tables, chunks):
+                lo, hi = np.searchsorted(keys, chunk, "left"), np.searchsorted(keys, chunk, "right")
+                buckets.append((hi - lo, entries, lo, hi))
+            buckets.sort(key=lambda bucket: bucket[0])
+            parts.extend(entries[lo:hi] for size, entries, lo, hi in buckets[:max_distance + 1] if size)
+            return parts
+        for (keys, entries), chunk in zip(tables, chunks):
+            probes = chunk ^ self._masks
+            los, his = np.searchsorted(keys, probes, "left"), np.searchsorted(keys, probes, "right")
+            parts.extend(entries[lo:hi] for lo, hi in zip(los, his) if hi > lo)
+        return parts
+
+    def query(self, value, max_distance=None, limit=None):
+        """[(distance, owner, document id bytes)] within ``max_distance`` bits, nearest first."""
+        max_distance = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+        query = _words(value)
+        # An entry may be in several buckets; cheaper to compare it twice
+        # than to deduplicate thousands of candidates first
+        candidates = np.concatenate(self._candidates(query, max_distance))
+        distances = _distances(self._hashes[candidates] ^ query)
+        near = {}
+        for entry, distance in zip(candidates[distances <= max_distance].tolist(),
+                                   distances[distances <= max_distance].tolist()):
+            near[entry] = distance
+        found = sorted((distance, entry) for entry, distance in near.items())
+        if limit is not None:
+            found = found[:limit]
+        return [
+            (distance, self._owner_names[self._owners[entry]], self._documents[entry].tobytes())
+            for distance, entry in found
+        ]
@@ -0,0 +1,176 @@
+import asyncio
+import contextlib
+import time
+from collections import Counter
+from datetime import datetime
+
+from .cache import ocr_cache, ocr_cache_key
+from .config import DOCUMENT_MAX_PAGES, OCR_WORKERS
+from .db import get_repo
+from .extract import extract, detect_doc_type, merge_pages, score_field
+from .fraud import image_index, screen
+from .metrics import DOCUMENTS, DOCUMENT_PAGES, stage_timer
+from .ocr import run_ocr
+from .pdf import page_count
+from .utils import PDF_TYPE, UploadTooLarge, stored_path
+
+
+# -------------------- PIPELINE --------------------
+async def ocr_with_cache(stored, page=None):
+    """run_ocr through the OCR cache; timings are empty on a cache hit."""
+    # Resubmitted images skip Tesseract entirely
+    key = ocr_cache_key(stored["sha256"], page)
+    with stage_timer("ocr_cache_get"):
+        result = await ocr_cache.get(key)
+    if result is not None:
+        DOCUMENT_PAGES.inc(cached="true")
+        return dict(result, timings={})
+    DOCUMENT_PAGES.inc(cached="false")
+    ocr_start = time.time()
+    result = await run_ocr(stored_path(stored["path"]), page)
+    with stage_timer("ocr_cache_put"):
+        await ocr_cache.put(key, result, int((time.time() - ocr_start) * 1000))
+    return result
+
+
+async def document_pages(files):
+    """[(stored, pdf page or None)] for every page of ``files``, in reading order."""
+    pages = []
+    for stored in files:
+        if stored["contentType"] == PDF_TYPE:
+            count = await asyncio.to_thread(page_count, stored_path(stored["path"]))
+            pages.extend((stored, index) for index in range(count))
+        else:
+            pages.append((stored, None))
+        if len(pages) > DOCUMENT_MAX_PAGES:
+            raise UploadTooLarge(f"A document may have at most {DOCUMENT_MAX_PAGES} pages")
+    return pages
+
+
+def _parse(result):
+    parsed, confidence = extract(result["text"])
+    for field, value in (result.get("fields") or {}).items():
+        # Template crops are more reliable than regexes over the joined text
+        value, score = score_field(field, value)
+        if value is not None:
+            parsed[field], confidence[field] = value, score
+    return parsed, confidence
+
+
+async def ocr_pages(pages, shared_slots=None):
+    """OCR every page in parallel; returns [(result, latency ms)] in page order.
+
+    ``shared_slots`` is a semaphore the pages also hold, shared with other
+    documents (the batch workers' total OCR concurrency).
+    """
+    # One document may use every OCR worker but no more, so a long PDF
+    # doesn't fill the shared queue and push other uploads into 429s
+    slots = asyncio.Semaphore(OCR_WORKERS)
+    shared = shared_slots if shared_slots is not None else contextlib.nullcontext()
+
+    async def ocr_page(stored, page):
+        async with slots, shared:
+            start = time.time()
+            result = await ocr_with_cache(stored, page)
+            return result, int((time.time() - start) * 1000)
+
+    tasks = [asyncio.ensure_future(ocr_page(stored, page)) for stored, page in pages]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        # The upload fails as a whole (e.g. 429 for one page): stop its other
+        # pages rather than leave them queued for OCR workers
+        for task in tasks:
+            task.cancel()
+        raise
+
+
+async def build_document(stored, filename, user_id, extra_files=(), ocr_slots=None):
+    """OCR and parse one stored upload; returns (record, kyc row) ready to write.
+
+    ``stored`` is the reference returned by utils.store_upload; a PDF is
+    split into its pages and ``extra_files`` (e.g. the back of a card) are
+    appended as further pages. Shared by the single-file /upload/ endpoint
+    and the batch workers so both write the same records to
+    uploaded_documents and kyc_data; the workers pass ``ocr_slots`` to cap
+    their combined OCR concurrency (see ``ocr_pages``). The record's
+    "fraudChecks" compares it with earlier uploads (app/fraud.py); once the
+    record is written, its page hashes are added with ``image_index.insert``.
+    """
+    start_time = time.time()
+    files = [stored, *extra_files]
+    with stage_timer("pages"):
+        pages = await document_pages(files)
+
+    ocr_start = time.time()
+    with stage_timer("ocr_document"):
+        results = await ocr_pages(pages, ocr_slots)
+    ocr_time_ms = int((time.time() - ocr_start) * 1000)
+
+    with stage_timer("parse"):
+        parsed, confidence, field_pages = merge_pages([_parse(result) for result, _ in results])
+        doc_type = detect_doc_type(parsed)
+    matched = next((result for result, _ in results if result.get("template")), {})
+
+    page_records = []
+    stage_timings = Counter()
+    for number, ((page_file, pdf_page), (result, latency_ms)) in enumerate(zip(pages, results), 1):
+        page_records.append({
+            "page": number,
+            "sha256": page_file["sha256"],
+            "pdfPage": None if pdf_page is None else pdf_page + 1,
+            "template": result.get("template"),
+            "phash": result.get("phash"),
+            "latencyMs": latency_ms,
+            "cached": not result["timings"],
+            "stageTimingsMs": result["timings"],
+        })
+        stage_timings.update(result["timings"])
+
+    with stage_timer("fraud_screen"):
+        fraud_checks = await screen([page["phash"] for page in page_records], parsed, user_id)
+
+    record = {
+        "userId": user_id,
+        "filename": filename,
+        "file": stored,
+        "docType": doc_type,
+        # Form feed between pages, as Tesseract does for multi-page input
+        "rawText": "\f".join(result["text"] for result, _ in results),
+        "parsed": parsed,
+        "confidence": confidence,
+        "fieldPages": field_pages,
+        "pageCount": len(pages),
+        "pages": page_records,
+        "processingTimeMs": int((time.time() - start_time) * 1000),
+        "ocrTimeMs": ocr_time_ms,
+        # Summed over pages; per-page timings are in "pages"
+        "stageTimingsMs": {stage: round(ms, 2) for stage, ms in stage_timings.items()},
+        "template": matched.get("template"),
+        "templateConfidence": matched.get("confidence"),
+        "fraudChecks": fraud_checks,
+        "uploadedAt": datetime.utcnow().isoformat(),
+    }
+    if extra_files:
+        record["extraFiles"] = list(extra_files)
+
+    # kyc_data holds the parsed fields only; the repository links it to the
+    # upload through documentId when both are written
+    kyc = {
+        "userId": user_id,
+        "docType": doc_type,
+        "parsedData": parsed,
+        "createdAt": datetime.utcnow().isoformat(),
+    }
+    return record, kyc
+
+
+async def process_document(stored, filename, user_id, extra_files=()):
+    """build_document, then write the upload and its kyc_data row together."""
+    record, kyc = await build_document(stored, filename, user_id, extra_files)
+    with stage_timer("db_write"):
+        await get_repo().insert_document(record, kyc)
+    await image_index.insert([record])
+    record["_id"] = str(record["_id"])
+    DOCUMENTS.inc(doc_type=record["docType"], source="upload")
+    return record
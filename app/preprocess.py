@@ -0,0 +1,148 @@
+"""Image clean-up between decode and Tesseract.
+
+Each stage takes and returns a PIL image. ``preprocess`` runs the stages named
+in PREPROCESS_STAGES in order and reports how long each one took, so the
+benchmark (and the upload record) can show what every stage costs.
+"""
+import time
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from .config import (
+    PREPROCESS_STAGES,
+    PREPROCESS_TARGET_DPI,
+    PREPROCESS_THRESHOLD_BLOCK,
+    PREPROCESS_THRESHOLD_OFFSET,
+    PREPROCESS_DESKEW_MAX_ANGLE,
+)
+
+# ID-1 card (Aadhaar, PAN) long edge in inches
+CARD_WIDTH_IN = 85.6 / 25.4
+# A4 short edge in inches, e.g. an e-Aadhaar printout
+PAGE_WIDTH_IN = 210 / 25.4
+# Height / width of a portrait A4 or Letter page, with some slack
+PAGE_ASPECT = (1.25, 1.5)
+# Lowest resolution metadata taken to be a scanner's rather than a default
+# (72 and 96 are screen defaults, also on photos and screenshots of cards)
+SCAN_MIN_DPI = 150
+
+
+def fix_orientation(image):
+    # Phone cameras store rotation in EXIF instead of rotating the pixels
+    return ImageOps.exif_transpose(image)
+
+
+def to_grayscale(image):
+    return image.convert("L")
+
+
+def _page_scale(image, dpi):
+    """Scale that brings a full-page image to ``dpi``, or None if it looks like a card."""
+    scan_dpi = image.info.get("dpi", (0, 0))[0]
+    if scan_dpi >= SCAN_MIN_DPI and max(image.size) / scan_dpi > 2 * CARD_WIDTH_IN:
+        return dpi / scan_dpi
+    if PAGE_ASPECT[0] <= image.height / image.width <= PAGE_ASPECT[1]:
+        # Portrait and page-shaped: a scan or photo of a printout
+        return PAGE_WIDTH_IN * dpi / image.width
+    return None
+
+
+def resize_to_dpi(image, dpi=PREPROCESS_TARGET_DPI):
+    """Scale to about ``dpi``: 12 MP photos of a card shrink ~4x.
+
+    A card's long edge becomes a card width at ``dpi``. Full pages (a
+    scanner's resolution says the image is bigger than a card, or it is a
+    portrait page shape) are scaled to a page width instead, since at a
+    card width their text would be a few pixels high.
+    """
+    scale = _page_scale(image, dpi)
+    if scale is None:
+        scale = CARD_WIDTH_IN * dpi / max(image.size)
+    # Within 10% is close enough; resampling would only cost time
+    if abs(scale - 1) <= 0.1:
+        return image
+    size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    resample = Image.LANCZOS if scale < 1 else Image.BICUBIC
+    return image.resize(size, resample)
+
+
+def _local_mean(pixels, block):
+    # Box filter through a summed-area table: O(1) per pixel for any block size
+    half = block // 2
+    padded = np.pad(pixels, half + 1, mode="edge").astype(np.float64)
+    table = padded.cumsum(axis=0).cumsum(axis=1)
+    h, w = pixels.shape
+    total = (
+        table[block:block + h, block:block + w]
+        - table[:h, block:block + w]
+        - table[block:block + h, :w]
+        + table[:h, :w]
+    )
+    return total / (block * block)
+
+
+def adaptive_threshold(image, block=PREPROCESS_THRESHOLD_BLOCK, offset=PREPROCESS_THRESHOLD_OFFSET):
+    """Binarize against the local mean so shadows and glare don't wipe out text."""
+    pixels = np.asarray(image.convert("L"), dtype=np.float64)
+    block = max(3, block | 1)
+    binary = pixels > _local_mean(pixels, block) - offset
+    return Image.fromarray(np.where(binary, 255, 0).astype(np.uint8))
+
+
+def _skew_score(image):
+    # Text lines aligned with the rows give a spiky row profile (high variance)
+    ink = 255.0 - np.asarray(image, dtype=np.float64)
+    return ink.sum(axis=1).var()
+
+
+def deskew(image, max_angle=PREPROCESS_DESKEW_MAX_ANGLE, step=0.5):
+    """Rotate by the angle whose row projection is sharpest, searched on a thumbnail."""
+    gray = image.convert("L")
+    thumb = gray.copy()
+    thumb.thumbnail((400, 400))
+    angles = np.arange(-max_angle, max_angle + step, step)
+    scores = [_skew_score(thumb.rotate(a, resample=Image.BILINEAR, fillcolor=255)) for a in angles]
+    best = float(angles[int(np.argmax(scores))])
+    if abs(best) < step:
+        return image
+    return image.rotate(best, resample=Image.BICUBIC, expand=True, fillcolor=255 if image.mode == "L" else "white")
+
+
+STAGES = {
+    "exif": fix_orientation,
+    "grayscale": to_grayscale,
+    "resize": resize_to_dpi,
+    "threshold": adaptive_threshold,
+    "deskew": deskew,
+}
+
+
+def parse_stages(value):
+    names = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = [name for name in names if name not in STAGES]
+    if unknown:
+        raise ValueError(f"Unknown preprocessing stage(s): {', '.join(unknown)}")
+    return names
+
+
+def preprocess_version(stages=None):
+    """Identifies the stage list and parameters, for the OCR cache key."""
+    stages = parse_stages(PREPROCESS_STAGES) if stages is None else stages
+    if not stages:
+        return "none"
+    return (
+        f"{'+'.join(stages)}/dpi{PREPROCESS_TARGET_DPI}-pages/block{PREPROCESS_THRESHOLD_BLOCK}"
+        f"/offset{PREPROCESS_THRESHOLD_OFFSET}/skew{PREPROCESS_DESKEW_MAX_ANGLE}"
+    )
+
+
+def preprocess(image, stages=None):
+    """Run the configured stages; returns (image, {stage: milliseconds})."""
+    stages = parse_stages(PREPROCESS_STAGES) if stages is None else stages
+    timings = {}
+    for name in stages:
+        start = time.perf_counter()
+        image = STAGES[name](image)
+        timings[name] = round((time.perf_counter() - start) * 1000, 2)
+    return image, timings
@@ -0,0 +1,114 @@
+"""Sampled per-request profiling.
+
+A PROFILE_SAMPLE_RATE fraction of requests (or any request whose
+``X-Profile`` header carries PROFILE_TOKEN while profiling is enabled) runs
+under cProfile or pyinstrument and its trace is written to PROFILE_DIR. One
+request per process is profiled at a time: both profilers hook the event
+loop thread, and a second one would fail to start (Python 3.12+) or cut the
+first one's trace short, so requests arriving meanwhile are not sampled.
+
+cProfile sees everything the event loop thread does while the request is in
+flight, including other requests' coroutines. pyinstrument's async mode
+attributes time to the profiled request only. OCR itself runs in the worker
+processes and shows up as the await in ``ocr.run_ocr``.
+"""
+import cProfile
+import hmac
+import importlib.util
+import os
+import random
+import re
+import time
+
+from .config import PROFILE_SAMPLE_RATE, PROFILE_DIR, PROFILER, PROFILE_TOKEN
+
+PROFILERS = ("cprofile", "pyinstrument")
+
+
+def profiler_name(name=PROFILER):
+    if name not in PROFILERS:
+        raise ValueError(f"Unknown PROFILER {name!r}; expected {', '.join(PROFILERS)}")
+    if name == "pyinstrument" and importlib.util.find_spec("pyinstrument") is None:
+        raise ValueError("PROFILER=pyinstrument needs `pip install pyinstrument`")
+    return name
+
+
+def enabled():
+    return PROFILE_SAMPLE_RATE > 0
+
+
+# The RequestProfile currently running in this process, if any. Only touched
+# from the event loop thread.
+_active = None
+
+
+def forced(request, token=PROFILE_TOKEN):
+    """Whether the request asks to be profiled with the configured token."""
+    header = request.headers.get("x-profile")
+    return bool(token) and header is not None and hmac.compare_digest(header.encode(), token.encode())
+
+
+def should_profile(request):
+    if not enabled() or _active is not None:
+        return False
+    return forced(request) or random.random() < PROFILE_SAMPLE_RATE
+
+
+def start_profile(request):
+    """A started RequestProfile if this request is sampled, else None."""
+    global _active
+    if not should_profile(request):
+        return None
+    profile = RequestProfile()
+    try:
+        profile.start()
+    except ValueError:
+        # Another profiler (e.g. one attached from outside) owns the thread
+        return None
+    _active = profile
+    return profile
+
+
+class RequestProfile:
+    """Profiles the enclosed ``await``s and dumps the trace on ``save()``."""
+
+    def __init__(self, name=PROFILER):
+        self.name = profiler_name(name)
+        if self.name == "pyinstrument":
+            from pyinstrument import Profiler
+
+            self._profiler = Profiler(async_mode="enabled")
+        else:
+            self._profiler = cProfile.Profile()
+
+    def start(self):
+        if self.name == "pyinstrument":
+            self._profiler.start()
+        else:
+            self._profiler.enable()
+
+    def stop(self):
+        global _active
+        try:
+            if self.name == "pyinstrument":
+                self._profiler.stop()
+            else:
+                self._profiler.disable()
+        finally:
+            if _active is self:
+                _active = None
+
+    def save(self, method, route, elapsed_ms, directory=PROFILE_DIR):
+        """Write the trace; returns its file name (relative to ``directory``)."""
+        os.makedirs(directory, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+        stem = f"{time.strftime('%Y%m%dT%H%M%S')}-{method}-{slug}-{int(elapsed_ms)}ms-{random.randrange(16 ** 6):06x}"
+        if self.name == "pyinstrument":
+            filename = f"{stem}.html"
+            with open(os.path.join(directory, filename), "w", encoding="utf-8") as f:
+                f.write(self._profiler.output_html())
+        else:
+            # Open with `python -m pstats` or snakeviz
+            filename = f"{stem}.prof"
+            self._profiler.dump_stats(os.path.join(directory, filename))
+        return filename
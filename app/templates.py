@@ -0,0 +1,136 @@
+"""Region-of-interest OCR for document types with a known layout.
+
+Each template lists its field boxes as fractions of the card (x0, y0, x1, y1)
+with a Tesseract page segmentation mode and character whitelist per field.
+``match_template`` OCRs only the template's anchor field (the ID number) to
+pick a template, then the remaining small crops in parallel. It returns None
+when no template matches confidently, and the caller falls back to full-page
+OCR.
+"""
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from .config import TEMPLATE_MIN_CONFIDENCE, TEMPLATE_THREADS
+from .extract import aadhaar_valid, pan_valid
+from .ocr_backends import get_backend
+
+# Bump when a box, config or validator changes so cached results are redone
+TEMPLATE_VERSION = "2"
+
+DIGITS = "0123456789"
+UPPER_ALNUM = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+
+TEMPLATES = {
+    "Aadhaar": {
+        "aspect": (1.6, 2.4),
+        "anchor": "aadhaarNumber",
+        "fields": {
+            "aadhaarNumber": {"box": (0.25, 0.76, 0.75, 0.84), "psm": 7, "whitelist": DIGITS,
+                              "pattern": r"\d{12}", "strip": r"\s+", "check": aadhaar_valid},
+            "name": {"box": (0.36, 0.09, 0.98, 0.18), "psm": 7, "label": r"name"},
+            "dob": {"box": (0.36, 0.18, 0.98, 0.255), "psm": 7, "label": r"(dob|date of birth)",
+                    "pattern": r"\d{2,4}[-/]\d{2}[-/]\d{2,4}"},
+            "gender": {"box": (0.36, 0.255, 0.98, 0.33), "psm": 7, "label": r"(gender|sex)",
+                       "pattern": r"(?i)male|female|transgender"},
+            "address": {"box": (0.36, 0.33, 0.98, 0.50), "psm": 6, "label": r"address"},
+        },
+    },
+    "PAN": {
+        "aspect": (1.3, 2.0),
+        "anchor": "panNumber",
+        "fields": {
+            "panNumber": {"box": (0.33, 0.33, 0.75, 0.425), "psm": 7, "whitelist": UPPER_ALNUM,
+                          "pattern": r"[A-Z]{5}[0-9]{4}[A-Z]", "strip": r"\s+", "check": pan_valid},
+            "name": {"box": (0.33, 0.495, 0.95, 0.57), "psm": 7, "label": r"name"},
+            "fatherName": {"box": (0.33, 0.578, 0.95, 0.65), "psm": 7, "label": r"father'?s?\s*name"},
+        },
+    },
+}
+
+_pool = None
+
+
+def _get_pool():
+    # Created lazily so each OCR worker process gets its own threads
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=TEMPLATE_THREADS)
+    return _pool
+
+
+def _crop(image, box):
+    x0, y0, x1, y1 = box
+    w, h = image.size
+    return image.crop((int(x0 * w), int(y0 * h), int(x1 * w), int(y1 * h)))
+
+
+def _clean(text, spec):
+    value = " ".join(text.split())
+    if spec.get("label"):
+        value = re.sub(rf"(?i)^\W*{spec['label']}\s*[:\-]?\s*", "", value)
+    if spec.get("strip"):
+        value = re.sub(spec["strip"], "", value)
+    if not value:
+        return None
+    if spec.get("pattern") and not re.fullmatch(spec["pattern"], value):
+        return None
+    if spec.get("check") and not spec["check"](value):
+        return None
+    return value
+
+
+def ocr_field(image, spec):
+    """OCR one field box; returns (raw text, cleaned value or None)."""
+    crop = _crop(image, spec["box"])
+    text = get_backend().image_to_string(crop, psm=spec["psm"], whitelist=spec.get("whitelist"))
+    return text.strip(), _clean(text, spec)
+
+
+def candidates(image):
+    ratio = image.width / image.height
+    return [name for name, t in TEMPLATES.items() if t["aspect"][0] <= ratio <= t["aspect"][1]]
+
+
+def classify(image):
+    """Pick the template whose anchor field reads as a valid ID number."""
+    names = candidates(image)
+    pool = _get_pool()
+    futures = {
+        name: pool.submit(ocr_field, image, TEMPLATES[name]["fields"][TEMPLATES[name]["anchor"]])
+        for name in names
+    }
+    matched = [(name, f.result()) for name, f in futures.items()]
+    matched = [(name, result) for name, result in matched if result[1] is not None]
+    # Both anchors reading as valid means the layout is ambiguous
+    if len(matched) != 1:
+        return None, None
+    return matched[0]
+
+
+def match_template(image):
+    """Template OCR of ``image``.
+
+    Returns {"template", "confidence", "fields", "text"} or None when no
+    template reaches TEMPLATE_MIN_CONFIDENCE.
+    """
+    name, anchor_result = classify(image)
+    if name is None:
+        return None
+    template = TEMPLATES[name]
+    others = [field for field in template["fields"] if field != template["anchor"]]
+    pool = _get_pool()
+    futures = {field: pool.submit(ocr_field, image, template["fields"][field]) for field in others}
+    results = {template["anchor"]: anchor_result}
+    results.update({field: f.result() for field, f in futures.items()})
+
+    fields = {field: value for field, (_, value) in results.items()}
+    found = sum(1 for field in others if fields[field])
+    # The anchor is worth 0.6 on its own; the other fields share the rest
+    confidence = 0.6 + 0.4 * (found / len(others) if others else 1)
+    if confidence < TEMPLATE_MIN_CONFIDENCE:
+        return None
+
+    if fields.get("gender"):
+        fields["gender"] = fields["gender"].capitalize()
+    text = "\n".join(results[field][0] for field in template["fields"] if results[field][0])
+    return {"template": name, "confidence": round(confidence, 2), "fields": fields, "text": text}
@@ -1,10 +1,178 @@
+import asyncio
+import hashlib
 import os
+import tempfile
 import uuid
 from pathlib import Path
-from .config import UPLOAD_DIR
+from .config import UPLOAD_DIR, UPLOAD_MAX_BYTES, UPLOAD_CHUNK_SIZE
 
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+# Content-addressed uploads live under UPLOAD_DIR/objects/<aa>/<bb>/<sha256><ext>
+OBJECTS_DIR = Path(UPLOAD_DIR) / "objects"
+SPOOL_DIR = Path(UPLOAD_DIR) / "tmp"
+
+# (magic prefix, content type, extension), checked against the first chunk
+_SIGNATURES = [
+    (b"\xff\xd8\xff", "image/jpeg", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png", ".png"),
+    (b"II*\x00", "image/tiff", ".tif"),
+    (b"MM\x00*", "image/tiff", ".tif"),
+    (b"BM", "image/bmp", ".bmp"),
+    (b"%PDF-", "application/pdf", ".pdf"),
+    (b"PK\x03\x04", "application/zip", ".zip"),
+]
+_EXTENSIONS = {content_type: ext for _, content_type, ext in _SIGNATURES}
+_EXTENSIONS["image/webp"] = ".webp"
+
+IMAGE_TYPES = frozenset({"image/jpeg", "image/png", "image/tiff", "image/bmp", "image/webp"})
+PDF_TYPE = "application/pdf"
+# Anything that can be OCR'd as a document: images and (multi-page) PDFs
+DOCUMENT_TYPES = IMAGE_TYPES | {PDF_TYPE}
+
+
+class UploadRejected(Exception):
+    status_code = 400
+
+
+class UploadTooLarge(UploadRejected):
+    status_code = 413
+
+
+class UnsupportedFileType(UploadRejected):
+    status_code = 415
+
+
+def sniff_type(head):
+    """Content type from the leading bytes of a file, or None if unrecognised."""
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    for magic, content_type, _ in _SIGNATURES:
+        if head.startswith(magic):
+            return content_type
+    return None
+
+
+def stored_path(relative_path):
+    return os.path.join(UPLOAD_DIR, relative_path)
+
+
+class _Spool:
+    """Writes chunks to a temp file while hashing, sniffing and enforcing the size cap."""
+
+    def __init__(self, max_bytes, allowed, type_limits=None):
+        SPOOL_DIR.mkdir(parents=True, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(dir=SPOOL_DIR)
+        self.file = os.fdopen(fd, "wb")
+        self.max_bytes = max_bytes
+        self.allowed = allowed
+        # Per content type overrides of max_bytes, e.g. a larger cap for zips
+        self.type_limits = type_limits or {}
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.content_type = None
+
+    def write(self, chunk):
+        if self.size == 0:
+            self.content_type = sniff_type(chunk[:16])
+            if self.content_type not in self.allowed:
+                raise UnsupportedFileType("Unsupported file type")
+            self.max_bytes = self.type_limits.get(self.content_type, self.max_bytes)
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise UploadTooLarge(f"File exceeds the {self.max_bytes // (1024 * 1024)} MB upload limit")
+        self.digest.update(chunk)
+        self.file.write(chunk)
+
+    def discard(self):
+        self.file.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def commit(self):
+        """Move the spooled file to its content address; an existing copy is reused."""
+        self.file.close()
+        if self.size == 0:
+            self.discard()
+            raise UploadRejected("Empty file")
+        sha256 = self.digest.hexdigest()
+        target = OBJECTS_DIR / sha256[:2] / sha256[2:4] / f"{sha256}{_EXTENSIONS[self.content_type]}"
+        relative = target.relative_to(UPLOAD_DIR)
+        if target.exists():
+            os.remove(self.path)
+        else:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(self.path, target)
+        return {"sha256": sha256, "path": str(relative), "size": self.size, "contentType": self.content_type}
+
+
+async def store_upload(upload_file, max_bytes=UPLOAD_MAX_BYTES, allowed=IMAGE_TYPES):
+    """Stream an UploadFile into content-addressed storage in UPLOAD_CHUNK_SIZE chunks.
+
+    Returns the stored reference {"sha256", "path", "size", "contentType"}; the
+    path is relative to UPLOAD_DIR. Raises UploadRejected subclasses for files
+    that are too large or of a type not in ``allowed``.
+    """
+    spool = _Spool(max_bytes, allowed)
+    try:
+        while chunk := await upload_file.read(UPLOAD_CHUNK_SIZE):
+            await asyncio.to_thread(spool.write, chunk)
+        return spool.commit()
+    except BaseException:
+        spool.discard()
+        raise
+
+
+async def store_uploads(upload_files, max_bytes=UPLOAD_MAX_BYTES, allowed=IMAGE_TYPES):
+    """store_upload for files accepted or rejected together (e.g. a document's pages).
+
+    Every file is spooled before any is committed, so a rejected file
+    leaves none of the others in storage.
+    """
+    spools = []
+    try:
+        for upload_file in upload_files:
+            spool = await spool_upload(upload_file, max_bytes, allowed)
+            spools.append(spool)
+            if not spool.size:
+                raise UploadRejected(f"{upload_file.filename} is empty")
+        return [spool.commit() for spool in spools]
+    except BaseException:
+        for spool in spools:
+            spool.discard()
+        raise
+
+
+async def spool_upload(upload_file, max_bytes=UPLOAD_MAX_BYTES, allowed=IMAGE_TYPES, type_limits=None):
+    """Stream an UploadFile to a temp file without committing it to storage.
+
+    The caller either ``commit()``s the returned spool into content-addressed
+    storage or ``discard()``s it (e.g. an archive after unpacking).
+    """
+    spool = _Spool(max_bytes, allowed, type_limits)
+    try:
+        while chunk := await upload_file.read(UPLOAD_CHUNK_SIZE):
+            await asyncio.to_thread(spool.write, chunk)
+    except BaseException:
+        spool.discard()
+        raise
+    spool.file.close()
+    return spool
+
+
+def spool_stream(fileobj, max_bytes=UPLOAD_MAX_BYTES, allowed=IMAGE_TYPES):
+    """spool_upload for a synchronous file object (e.g. a zip member)."""
+    spool = _Spool(max_bytes, allowed)
+    try:
+        while chunk := fileobj.read(UPLOAD_CHUNK_SIZE):
+            spool.write(chunk)
+    except BaseException:
+        spool.discard()
+        raise
+    spool.file.close()
+    return spool
+
+
 def save_upload_file(upload_file, subdir=""):
     ext = os.path.splitext(upload_file.filename)[1]
     filename = f"{uuid.uuid4().hex}{ext}"
@@ -12,6 +180,7 @@ def save_upload_file(upload_file, subdir=""):
     dir_path.mkdir(parents=True, exist_ok=True)
     file_path = dir_path / filename
     with file_path.open("wb") as f:
-        content = upload_file.file.read()
-        f.write(content)
+        # Copy in chunks rather than reading the whole upload into memory
+        while chunk := upload_file.file.read(UPLOAD_CHUNK_SIZE):
+            f.write(chunk)
     return str(file_path)
@@ -0,0 +1,173 @@
+"""Synthetic Aadhaar and PAN card images with known ground truth.
+
+The layouts copy the samples in `test images/` (same canvas size, photo box
+and text positions), so the document templates in ``app/templates.py``
+apply to them. Aadhaar numbers carry a valid Verhoeff check digit and PANs
+a valid holder type, so they pass extraction with EXTRACT_VERIFY_CHECKSUMS
+on. ``distort`` adds the rotation, blur and sensor noise of a phone photo;
+``fmt="JPEG"`` adds compression loss.
+
+    from cards import generate
+    for filename, data, content_type, truth in generate(20, seed=1):
+        ...
+"""
+import io
+import random
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from app.extract import verhoeff_check_digit  # noqa: E402
+
+FIRST_NAMES = ["Kavita", "Ravi", "Anita", "Suresh", "Priya", "Arjun", "Meena", "Vikram", "Pooja", "Rahul",
+               "Sunita", "Amit", "Neha", "Rajesh", "Deepa", "Manoj", "Kiran", "Sanjay", "Lakshmi", "Imran"]
+LAST_NAMES = ["Saini", "Sharma", "Verma", "Patel", "Reddy", "Iyer", "Gupta", "Singh", "Nair", "Khan",
+              "Das", "Joshi", "Mehta", "Rao", "Kulkarni", "Chopra", "Bose", "Menon", "Yadav", "Pillai"]
+STREETS = ["Old Town", "MG Road", "Park Street", "Station Road", "Lake View", "Civil Lines", "Gandhi Nagar"]
+CITIES = [("Indore", "452001"), ("Pune", "411001"), ("Jaipur", "302001"), ("Kochi", "682001"),
+          ("Nagpur", "440001"), ("Mysuru", "570001"), ("Bhopal", "462001")]
+
+# Fonts close to the samples' sans-serif; Pillow's own font as a last resort
+FONT_PATHS = [
+    "DejaVuSans.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf",
+    "/Library/Fonts/Arial.ttf",
+    "C:/Windows/Fonts/arial.ttf",
+]
+
+
+def font(size):
+    for path in FONT_PATHS:
+        try:
+            return ImageFont.truetype(path, size)
+        except OSError:
+            continue
+    return ImageFont.load_default(size)
+
+
+def aadhaar_number(rng):
+    digits = str(rng.randint(2, 9)) + "".join(str(rng.randint(0, 9)) for _ in range(10))
+    return digits + verhoeff_check_digit(digits)
+
+
+def pan_number(rng, surname):
+    # 4th letter P: an individual; 5th: the first letter of the surname
+    letters = "".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ") for _ in range(3))
+    digits = "".join(str(rng.randint(0, 9)) for _ in range(4))
+    return f"{letters}P{surname[0].upper()}{digits}{rng.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZ')}"
+
+
+def random_person(rng):
+    surname = rng.choice(LAST_NAMES)
+    city, pin = rng.choice(CITIES)
+    born = date(1950, 1, 1) + timedelta(days=rng.randint(0, 365 * 55))
+    first, father = rng.sample(FIRST_NAMES, 2)
+    return {
+        "name": f"{first} {surname}",
+        "fatherName": f"{father} {surname}",
+        "dob": born.isoformat(),
+        "gender": rng.choice(["Male", "Female"]),
+        "address": f"{rng.randint(1, 99)} {rng.choice(STREETS)}, {city}, {pin}",
+        "surname": surname,
+    }
+
+
+def aadhaar_card(person, number):
+    """Returns (image, ground truth) laid out like `test images/aadhaar_card.png`."""
+    image = Image.new("RGB", (1024, 512), "white")
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((40, 40, 340, 340), outline="black", width=3)
+    text = font(30)
+    for y, line in (
+        (50, f"Name: {person['name']}"),
+        (96, f"DOB: {person['dob']}"),
+        (132, f"Gender: {person['gender']}"),
+        (168, f"Address: {person['address']}"),
+    ):
+        draw.text((382, y), line, fill="black", font=text)
+    draw.text((403, 392), f"{number[:4]} {number[4:8]} {number[8:]}", fill="black", font=text)
+    truth = {
+        "docType": "Aadhaar",
+        "aadhaarNumber": number,
+        "name": person["name"],
+        "dob": person["dob"],
+        "gender": person["gender"],
+        "address": person["address"],
+    }
+    return image, truth
+
+
+def pan_card(person, number):
+    """Returns (image, ground truth) laid out like `test images/pan_card.png`."""
+    image = Image.new("RGB", (1000, 600), "white")
+    draw = ImageDraw.Draw(image)
+    heading, text = font(30), font(30)
+    draw.text((250, 31), "PERMANENT ACCOUNT NUMBER", fill="black", font=heading)
+    draw.rectangle((20, 79, 980, 81), fill="black")
+    draw.rectangle((40, 120, 290, 370), outline="black", width=3)
+    draw.text((110, 379), "Photo", fill="black", font=text)
+    draw.text((300, 151), "PERMANENT ACCOUNT NUMBER", fill="black", font=heading)
+    draw.text((350, 202), number, fill="black", font=font(46))
+    draw.text((350, 301), f"Name: {person['name']}", fill="black", font=text)
+    draw.text((350, 351), f"Father's Name: {person['fatherName']}", fill="black", font=text)
+    draw.text((40, 500), "Signature", fill="black", font=text)
+    draw.rectangle((40, 530, 390, 532), fill="black")
+    truth = {
+        "docType": "PAN",
+        "panNumber": number,
+        "name": person["name"],
+        "fatherName": person["fatherName"],
+    }
+    return image, truth
+
+
+def distort(image, rng, level):
+    """Phone-photo artefacts scaled by ``level`` (0 = none, 1 = mild, 2+ = rough)."""
+    if level <= 0:
+        return image
+    image = image.rotate(rng.uniform(-1.5, 1.5) * level, resample=Image.BICUBIC, expand=True, fillcolor="white")
+    image = image.filter(ImageFilter.GaussianBlur(0.4 * level))
+    pixels = np.asarray(image, dtype=np.float32)
+    noise = np.random.default_rng(rng.randrange(2 ** 32)).normal(0, 6 * level, pixels.shape)
+    return Image.fromarray(np.clip(pixels + noise, 0, 255).astype(np.uint8))
+
+
+def encode(image, fmt):
+    buf = io.BytesIO()
+    if fmt == "JPEG":
+        image.convert("RGB").save(buf, format="JPEG", quality=85)
+    else:
+        image.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def generate(count, seed=0, distortion=0.0, fmt="PNG"):
+    """[(filename, bytes, content type, ground truth)], alternating Aadhaar and PAN."""
+    rng = random.Random(seed)
+    cards = []
+    for i in range(count):
+        person = random_person(rng)
+        if i % 2 == 0:
+            image, truth = aadhaar_card(person, aadhaar_number(rng))
+        else:
+            image, truth = pan_card(person, pan_number(rng, person["surname"]))
+        image = distort(image, rng, distortion)
+        ext, content_type = (".jpg", "image/jpeg") if fmt == "JPEG" else (".png", "image/png")
+        cards.append((f"{truth['docType'].lower()}_{i:04d}{ext}", encode(image, fmt), content_type, truth))
+    return cards
+
+
+if __name__ == "__main__":
+    # Write a few cards out for a visual check
+    out = Path(sys.argv[1] if len(sys.argv) > 1 else "synthetic_cards")
+    out.mkdir(exist_ok=True)
+    for filename, data, _, truth in generate(6, seed=1, distortion=1.0):
+        (out / filename).write_bytes(data)
+        print(filename, truth)
@@ -0,0 +1,280 @@
+"""End-to-end load and accuracy benchmark of the KYC API, run in-process.
+
+Generates synthetic Aadhaar/PAN cards with known ground truth
+(``benchmarks/cards.py``), signs up a user and drives ``POST /upload/`` on
+the FastAPI app through an httpx AsyncClient over ASGITransport, with the app
+lifespan (OCR worker pool, Mongo repository, batch workers) running as in
+production. Reports throughput, p50/p95/p99 latency, peak RSS of the API
+process and of the OCR workers, and per-field extraction accuracy.
+
+    python benchmarks/e2e_bench.py --cards 40 --concurrency 8
+    python benchmarks/e2e_bench.py --save-baseline        # record the current build
+    python benchmarks/e2e_bench.py                        # exits 1 on a regression
+
+The store is mongomock by default (``pip install mongomock-motor``), so only
+the OCR, parsing and HTTP layers are measured; ``--store mongod`` writes to
+``--mongo-uri`` instead (the benchmark database is dropped afterwards). The
+OCR cache is off unless ``--ocr-cache`` is given, so repeated cards are OCR'd
+every time. Needs the system tesseract binary.
+
+A baseline is only comparable on the same machine with the same options;
+the options are saved with it and a mismatch is reported.
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_BASELINE = ROOT / "benchmarks" / "baselines" / "e2e.json"
+
+# Compared against the baseline with --tolerance; accuracy uses --accuracy-tolerance
+LOWER_IS_BETTER = ("p50Ms", "p95Ms", "p99Ms", "apiPeakRssMb", "workerPeakRssMb")
+HIGHER_IS_BETTER = ("throughputRps",)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cards", type=int, default=40, help="distinct synthetic cards (half Aadhaar, half PAN)")
+    parser.add_argument("--requests", type=int, default=None, help="uploads to send (default: one per card)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=2, help="uploads sent first and not measured")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--distortion", type=float, default=0.0, help="phone-photo artefacts, 0 (clean) to 2 (rough)")
+    parser.add_argument("--format", choices=("PNG", "JPEG"), default="PNG")
+    parser.add_argument("--store", choices=("mongomock", "mongod"), default="mongomock")
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017")
+    parser.add_argument("--db", default="kyc_e2e_bench")
+    parser.add_argument("--ocr-cache", action="store_true", help="leave the OCR result cache on")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="write this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="relative slowdown/throughput/memory change allowed (default 15%%)")
+    parser.add_argument("--accuracy-tolerance", type=float, default=0.02,
+                        help="absolute drop in field accuracy allowed (default 0.02)")
+    parser.add_argument("--json", type=Path, help="also write the results to this file")
+    return parser.parse_args()
+
+
+ARGS = parse_args()
+
+# The app reads its configuration at import
+os.environ["DB_NAME"] = ARGS.db
+os.environ["MONGO_URI"] = ARGS.mongo_uri
+os.environ["UPLOAD_DIR"] = tempfile.mkdtemp(prefix="kyc_e2e_")
+os.environ["OCR_CACHE_ENABLED"] = "1" if ARGS.ocr_cache else "0"
+os.environ.setdefault("BATCH_WORKERS", "0")
+if ARGS.store == "mongomock":
+    # mongomock has no transactions (nor the hello command used to detect them)
+    os.environ["MONGO_TRANSACTIONS"] = "0"
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+import httpx  # noqa: E402
+
+from app import db, ocr  # noqa: E402
+from app.main import app  # noqa: E402
+from cards import generate  # noqa: E402
+
+EMAIL = "e2e-bench@example.com"
+PASSWORD = "E2eBench@123"
+
+
+def use_mongomock():
+    try:
+        from mongomock_motor import AsyncMongoMockClient
+    except ImportError:
+        sys.exit("--store mongomock needs `pip install mongomock-motor` (or use --store mongod)")
+    client = AsyncMongoMockClient()
+    db.create_client = lambda uri=None: client
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def peak_rss_mb(pid="self"):
+    """High-water RSS of a process in MB (Linux /proc; getrusage for ourselves elsewhere)."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if pid == "self":
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    return 0.0
+
+
+def worker_peak_rss_mb():
+    executor = ocr._executor
+    processes = getattr(executor, "_processes", None) or {}
+    return max((peak_rss_mb(pid) for pid in processes), default=0.0)
+
+
+def normalise(value):
+    return " ".join(str(value).split()).casefold() if value is not None else None
+
+
+def score(record, truth, fields):
+    """Update ``fields`` {field: [correct, total]} from one upload response."""
+    parsed = record.get("parsed") or {}
+    for field, expected in truth.items():
+        got = record.get("docType") if field == "docType" else parsed.get(field)
+        counts = fields[field]
+        counts[1] += 1
+        if normalise(got) == normalise(expected):
+            counts[0] += 1
+
+
+async def get_token(client):
+    await client.post("/signup", data={"name": "E2E Bench", "email": EMAIL, "password": PASSWORD})
+    r = await client.post("/login", data={"username": EMAIL, "password": PASSWORD})
+    r.raise_for_status()
+    return r.json()["access_token"]
+
+
+async def run_load(client, token, cards, total):
+    headers = {"Authorization": f"Bearer {token}"}
+    queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(cards[i % len(cards)])
+    latencies, statuses = [], Counter()
+    fields = defaultdict(lambda: [0, 0])
+
+    async def worker():
+        while not queue.empty():
+            filename, data, content_type, truth = queue.get_nowait()
+            start = time.perf_counter()
+            r = await client.post("/upload/", headers=headers, files={"file": (filename, data, content_type)})
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[r.status_code] += 1
+            if r.status_code == 200:
+                score(r.json(), truth, fields)
+            else:
+                # A failed upload extracted nothing
+                for field in truth:
+                    fields[field][1] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(ARGS.concurrency)))
+    return time.perf_counter() - start, latencies, statuses, fields
+
+
+async def benchmark():
+    cards = generate(ARGS.cards, seed=ARGS.seed, distortion=ARGS.distortion, fmt=ARGS.format)
+    total = ARGS.requests or len(cards)
+    if ARGS.store == "mongomock":
+        use_mongomock()
+
+    transport = httpx.ASGITransport(app=app)
+    # ASGITransport doesn't send lifespan events; run the lifespan ourselves
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+            token = await get_token(client)
+            if ARGS.warmup:
+                await run_load(client, token, cards, ARGS.warmup)
+            elapsed, latencies, statuses, fields = await run_load(client, token, cards, total)
+            worker_rss = worker_peak_rss_mb()
+            if ARGS.store == "mongod":
+                await db.get_repo().client.drop_database(ARGS.db)
+
+    ok = statuses.get(200, 0)
+    correct = sum(c for c, _ in fields.values())
+    checked = sum(t for _, t in fields.values())
+    return {
+        "options": {
+            "cards": ARGS.cards, "requests": total, "concurrency": ARGS.concurrency, "seed": ARGS.seed,
+            "distortion": ARGS.distortion, "format": ARGS.format, "store": ARGS.store, "ocrCache": ARGS.ocr_cache,
+        },
+        "requests": total,
+        "statuses": {str(code): n for code, n in sorted(statuses.items())},
+        "elapsedS": round(elapsed, 3),
+        "throughputRps": round(ok / elapsed, 3) if elapsed else 0.0,
+        "p50Ms": round(percentile(latencies, 50), 1),
+        "p95Ms": round(percentile(latencies, 95), 1),
+        "p99Ms": round(percentile(latencies, 99), 1),
+        "meanMs": round(statistics.fmean(latencies), 1) if latencies else 0.0,
+        "apiPeakRssMb": round(peak_rss_mb(), 1),
+        "workerPeakRssMb": round(worker_rss, 1),
+        "accuracy": round(correct / checked, 4) if checked else 0.0,
+        "fieldAccuracy": {field: round(c / t, 4) for field, (c, t) in sorted(fields.items()) if t},
+    }
+
+
+def report(result):
+    print(f"{result['requests']} uploads, concurrency {ARGS.concurrency}, statuses {result['statuses']}")
+    print(f"  throughput   {result['throughputRps']:>9.2f} req/s  ({result['elapsedS']:.1f} s)")
+    print(f"  latency ms   p50 {result['p50Ms']:.0f}  p95 {result['p95Ms']:.0f}  p99 {result['p99Ms']:.0f}"
+          f"  mean {result['meanMs']:.0f}")
+    print(f"  peak RSS MB  api {result['apiPeakRssMb']:.0f}  ocr worker {result['workerPeakRssMb']:.0f}")
+    print(f"  accuracy     {result['accuracy']:.1%} of fields")
+    for field, accuracy in result["fieldAccuracy"].items():
+        print(f"    {field:<14} {accuracy:.1%}")
+
+
+def regressions(result, baseline):
+    found = []
+    for key in LOWER_IS_BETTER:
+        if baseline.get(key) and result[key] > baseline[key] * (1 + ARGS.tolerance):
+            found.append(f"{key} {baseline[key]} -> {result[key]}")
+    for key in HIGHER_IS_BETTER:
+        if baseline.get(key) and result[key] < baseline[key] * (1 - ARGS.tolerance):
+            found.append(f"{key} {baseline[key]} -> {result[key]}")
+    accuracies = {"accuracy": (baseline.get("accuracy"), result["accuracy"])}
+    for field, before in baseline.get("fieldAccuracy", {}).items():
+        accuracies[f"fieldAccuracy.{field}"] = (before, result["fieldAccuracy"].get(field, 0.0))
+    for key, (before, after) in accuracies.items():
+        if before is not None and after < before - ARGS.accuracy_tolerance:
+            found.append(f"{key} {before} -> {after}")
+    return found
+
+
+def main():
+    try:
+        result = asyncio.run(benchmark())
+    finally:
+        shutil.rmtree(os.environ["UPLOAD_DIR"], ignore_errors=True)
+    report(result)
+    if ARGS.json:
+        ARGS.json.write_text(json.dumps(result, indent=2) + "\n")
+
+    if ARGS.save_baseline:
+        ARGS.baseline.parent.mkdir(parents=True, exist_ok=True)
+        ARGS.baseline.write_text(json.dumps(result, indent=2) + "\n")
+        print(f"baseline saved to {ARGS.baseline}")
+        return 0
+    if not ARGS.baseline.exists():
+        print(f"no baseline at {ARGS.baseline}; run with --save-baseline to record one")
+        return 0
+
+    baseline = json.loads(ARGS.baseline.read_text())
+    if baseline.get("options") != result["options"]:
+        print(f"warning: baseline was recorded with {baseline.get('options')}")
+    found = regressions(result, baseline)
+    if found:
+        print("REGRESSION against baseline:")
+        for line in found:
+            print(f"  {line}")
+        return 1
+    print("no regression against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""Throughput and accuracy of app.extract over a synthetic OCR corpus.
+
+Generates thousands of Aadhaar- and PAN-style OCR texts with known fields
+(valid Verhoeff/PAN numbers, some OCR-style noise lines and field orders),
+runs them through ``extract_many`` and prints texts/second and per-field
+accuracy.
+
+    python benchmarks/extract_bench.py --count 20000 --repeat 3
+"""
+import argparse
+import random
+import string
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from app.extract import PAN_HOLDER_TYPES, extract_many, verhoeff_check_digit  # noqa: E402
+
+FIRST = ["Kavita", "Rahul", "Anita", "Suresh", "Priya", "Amit", "Neha", "Vikram", "Pooja", "Arjun"]
+LAST = ["Saini", "Sharma", "Kumar", "Patel", "Reddy", "Iyer", "Singh", "Gupta", "Nair", "Das"]
+CITIES = [("Indore", "452001"), ("Pune", "411001"), ("Jaipur", "302001"), ("Chennai", "600001")]
+NOISE = ["GOVERNMENT OF INDIA", "Unique Identification Authority of India", "Photo", "Signature",
+         "INCOME TAX DEPARTMENT", "|| ~ ._", "Mera Aadhaar, Meri Pehchaan"]
+
+
+def person(rng):
+    return f"{rng.choice(FIRST)} {rng.choice(LAST)}"
+
+
+def aadhaar_number(rng):
+    digits = str(rng.randint(2, 9)) + "".join(rng.choice(string.digits) for _ in range(10))
+    return digits + verhoeff_check_digit(digits)
+
+
+def pan_number(rng, surname):
+    letters = "".join(rng.choice(string.ascii_uppercase) for _ in range(3))
+    return f"{letters}{rng.choice(sorted(PAN_HOLDER_TYPES))}{surname[0].upper()}{rng.randint(0, 9999):04d}{rng.choice(string.ascii_uppercase)}"
+
+
+def aadhaar_text(rng):
+    number = aadhaar_number(rng)
+    dob = f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.randint(1950, 2005)}"
+    city, pin = rng.choice(CITIES)
+    truth = {
+        "aadhaarNumber": number,
+        "name": person(rng),
+        "dob": dob,
+        "gender": rng.choice(["Male", "Female"]),
+        "address": f"{rng.randint(1, 300)} Old Town, {city}, {pin}",
+    }
+    lines = [
+        rng.choice(NOISE),
+        f"Name: {truth['name']}",
+        f"DOB: {dob}",
+        f"Gender: {truth['gender']}" if rng.random() < 0.5 else truth["gender"].upper(),
+        f"Address: {truth['address']}",
+        "",
+        f"{number[:4]} {number[4:8]} {number[8:]}",
+    ]
+    return "\n".join(lines), truth
+
+
+def pan_text(rng):
+    name, father = person(rng), person(rng)
+    truth = {
+        "panNumber": pan_number(rng, name.split()[1]),
+        "name": name,
+        "fatherName": father,
+        "dob": f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.randint(1950, 2005)}",
+    }
+    lines = [
+        "INCOME TAX DEPARTMENT",
+        "PERMANENT ACCOUNT NUMBER",
+        truth["panNumber"],
+        f"Name: {name}",
+        f"Father's Name: {father}",
+        f"Date of Birth {truth['dob']}",
+        rng.choice(NOISE),
+    ]
+    return "\n".join(lines), truth
+
+
+def corpus(count, seed):
+    rng = random.Random(seed)
+    return [(aadhaar_text if rng.random() < 0.5 else pan_text)(rng) for _ in range(count)]
+
+
+def main(args):
+    docs = corpus(args.count, args.seed)
+    texts = [text for text, _ in docs]
+
+    best = float("inf")
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        results = extract_many(texts)
+        best = min(best, time.perf_counter() - start)
+
+    correct, total = {}, {}
+    for (_, truth), (parsed, _) in zip(docs, results):
+        for field, expected in truth.items():
+            total[field] = total.get(field, 0) + 1
+            correct[field] = correct.get(field, 0) + (parsed[field] == expected)
+
+    print(f"{args.count} texts in {best * 1000:.1f} ms  ({args.count / best:,.0f} texts/s, best of {args.repeat})")
+    for field in sorted(total):
+        print(f"  {field:<14} {correct[field] / total[field]:7.2%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    main(parser.parse_args())
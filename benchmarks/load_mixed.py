@@ -0,0 +1,95 @@
+"""Mixed auth + upload load test against a running KYC API.
+
+Starts N concurrent clients that each loop over a weighted mix of
+``POST /login``, ``GET /api/get-user-docs`` and ``POST /upload/`` for a fixed
+duration, then prints p50/p99 latency per endpoint. Run it once against the
+old build and once against the new one to compare:
+
+    uvicorn app.main:app --workers 1 --port 8000
+    python benchmarks/load_mixed.py --base-url http://localhost:8000 --concurrency 16 --duration 30
+
+Requires httpx (``pip install httpx``).
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+SAMPLE_IMAGES = sorted((ROOT / "test images").glob("*.png"))
+
+EMAIL = "loadtest@example.com"
+PASSWORD = "Loadtest@123"
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+async def get_token(client):
+    await client.post("/signup", data={"name": "Load Test", "email": EMAIL, "password": PASSWORD})
+    r = await client.post("/login", data={"username": EMAIL, "password": PASSWORD})
+    r.raise_for_status()
+    return r.json()["access_token"]
+
+
+async def worker(client, token, images, mix, deadline, latencies, statuses):
+    headers = {"Authorization": f"Bearer {token}"}
+    kinds, weights = zip(*mix.items())
+    while time.perf_counter() < deadline:
+        kind = random.choices(kinds, weights)[0]
+        start = time.perf_counter()
+        if kind == "login":
+            r = await client.post("/login", data={"username": EMAIL, "password": PASSWORD})
+        elif kind == "docs":
+            r = await client.get("/api/get-user-docs", headers=headers)
+        else:
+            name, data = random.choice(images)
+            r = await client.post("/upload/", headers=headers, files={"file": (name, data, "image/png")})
+        latencies[kind].append((time.perf_counter() - start) * 1000)
+        statuses[kind][r.status_code] += 1
+
+
+async def main(args):
+    images = [(p.name, p.read_bytes()) for p in SAMPLE_IMAGES]
+    mix = {"login": args.login_weight, "docs": args.docs_weight, "upload": args.upload_weight}
+    latencies = defaultdict(list)
+    statuses = defaultdict(lambda: defaultdict(int))
+
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=120) as client:
+        token = await get_token(client)
+        deadline = time.perf_counter() + args.duration
+        await asyncio.gather(*[
+            worker(client, token, images, mix, deadline, latencies, statuses)
+            for _ in range(args.concurrency)
+        ])
+
+    print(f"{'endpoint':<8} {'count':>7} {'p50 ms':>9} {'p99 ms':>9} {'mean ms':>9}  statuses")
+    for kind in mix:
+        values = latencies[kind]
+        if not values:
+            continue
+        print(
+            f"{kind:<8} {len(values):>7} {percentile(values, 50):>9.1f} {percentile(values, 99):>9.1f} "
+            f"{statistics.fmean(values):>9.1f}  {dict(statuses[kind])}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument("--login-weight", type=float, default=1.0)
+    parser.add_argument("--docs-weight", type=float, default=3.0)
+    parser.add_argument("--upload-weight", type=float, default=1.0)
+    asyncio.run(main(parser.parse_args()))
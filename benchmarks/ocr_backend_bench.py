@@ -0,0 +1,62 @@
+"""Per-call cost of each OCR backend.
+
+Times ``image_to_string`` for every installed backend on three inputs: a
+blank 32x32 image (pure per-call overhead), the PAN number crop from the PAN
+sample (a typical template field) and the full preprocessed Aadhaar sample.
+
+    python benchmarks/ocr_backend_bench.py --repeat 50
+
+Needs the tesseract binary for pytesseract, and libtesseract + tesserocr for
+the tesserocr backend.
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from PIL import Image
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from app.ocr_backends import BACKENDS, available_backends  # noqa: E402
+from app.preprocess import preprocess  # noqa: E402
+from app.templates import TEMPLATES, _crop  # noqa: E402
+
+SAMPLES = ROOT / "test images"
+
+
+def inputs():
+    pan, _ = preprocess(Image.open(SAMPLES / "pan_card.png"))
+    aadhaar, _ = preprocess(Image.open(SAMPLES / "aadhaar_card.png"))
+    pan_field = TEMPLATES["PAN"]["fields"]["panNumber"]
+    return {
+        "blank 32x32": (Image.new("L", (32, 32), 255), 7, None),
+        "PAN number crop": (_crop(pan, pan_field["box"]), pan_field["psm"], pan_field["whitelist"]),
+        "full Aadhaar card": (aadhaar, 3, None),
+    }
+
+
+def main(args):
+    cases = inputs()
+    print(f"{'backend':<12} {'input':<18} {'p50 ms':>8} {'mean ms':>8} {'first ms':>9}")
+    for name in available_backends():
+        start = time.perf_counter()
+        backend = BACKENDS[name]()
+        init_ms = (time.perf_counter() - start) * 1000
+        for label, (image, psm, whitelist) in cases.items():
+            times = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                backend.image_to_string(image, psm=psm, whitelist=whitelist)
+                times.append((time.perf_counter() - start) * 1000)
+            print(f"{name:<12} {label:<18} {statistics.median(times):>8.1f} {statistics.fmean(times):>8.1f} {times[0]:>9.1f}")
+        print(f"{name:<12} {'(engine init)':<18} {init_ms:>8.1f}")
+        backend.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    main(parser.parse_args())
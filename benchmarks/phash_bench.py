@@ -0,0 +1,104 @@
+"""Lookup latency, memory and recall of the near-duplicate image index (app.phash).
+
+Fills a HashIndex with synthetic page hashes, then times queries for
+near-copies of stored pages (a few bits flipped, as re-encoding does) and for
+unseen pages, with some entries still pending a rebuild as in the app.
+Real card hashes cluster: every card of one type shares its
+layout, so hashes are drawn around a few template hashes, which puts many
+entries into the same chunk buckets as a real corpus does. Recall is checked
+against a linear scan for a sample of the queries.
+
+    python benchmarks/phash_bench.py --entries 1000000 --queries 2000
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from app.phash import HASH_BITS, HashIndex, hamming  # noqa: E402
+
+
+def flip(value, bits, rng):
+    for bit in rng.sample(range(HASH_BITS), bits):
+        value ^= 1 << bit
+    return value
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def main(args):
+    rng = random.Random(args.seed)
+    templates = [rng.getrandbits(HASH_BITS) for _ in range(args.templates)]
+    owners = [f"user{i}" for i in range(max(1, args.entries // 3))]
+
+    hashes = [flip(rng.choice(templates), args.spread, rng) for _ in range(args.entries)]
+
+    before = rss_mb()
+    start = time.perf_counter()
+    index = HashIndex(args.max_distance)
+    for i, value in enumerate(hashes):
+        index.add(value, rng.choice(owners), i.to_bytes(12, "big"))
+        if i == args.entries - args.pending - 1:
+            add_s = time.perf_counter() - start
+            index.rebuild()
+            build_s = time.perf_counter() - start - add_s
+    memory = rss_mb() - before
+
+    queries = []
+    for _ in range(args.queries):
+        if rng.random() < 0.5:
+            queries.append(flip(rng.choice(hashes), rng.randint(0, args.max_distance), rng))
+        else:
+            queries.append(flip(rng.choice(templates), args.spread, rng))
+
+    latencies, found = [], 0
+    for value in queries:
+        start = time.perf_counter()
+        found += bool(index.query(value))
+        latencies.append((time.perf_counter() - start) * 1e6)
+
+    missed = 0
+    sample = queries[:args.recall_sample]
+    for value in sample:
+        expected = sum(1 for h in hashes if hamming(h, value) <= args.max_distance)
+        missed += expected - len(index.query(value))
+
+    print(f"{args.entries:,} hashes ({HASH_BITS} bits), ~{memory:.0f} MB: added in {add_s:.1f} s, "
+          f"tables sorted in {build_s:.2f} s, {args.pending} left pending")
+    print(f"{len(queries)} queries, max distance {args.max_distance}: {found} with a match")
+    print(f"  latency us   p50 {percentile(latencies, 50):.0f}  p95 {percentile(latencies, 95):.0f}"
+          f"  p99 {percentile(latencies, 99):.0f}  mean {statistics.fmean(latencies):.0f}")
+    print(f"  recall       {len(sample)} queries checked by linear scan, {missed} matches missed")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--max-distance", type=int, default=6)
+    parser.add_argument("--templates", type=int, default=8, help="layouts the hashes cluster around")
+    parser.add_argument("--spread", type=int, default=24, help="bits each page differs from its layout")
+    parser.add_argument("--pending", type=int, default=HashIndex.PENDING_MAX // 2,
+                        help="entries added after the last rebuild, as between rebuilds in the app")
+    parser.add_argument("--recall-sample", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    main(parser.parse_args())
@@ -0,0 +1,98 @@
+"""OCR latency and field accuracy with and without each preprocessing stage.
+
+Runs the `test images/` samples through ``run_ocr_sync`` in-process (no API,
+no Mongo) with no preprocessing, the full default pipeline, the pipeline with
+each stage removed in turn, and the pipeline plus deskew. ``--scale`` upsamples
+the samples first to mimic full-resolution phone photos.
+
+    python benchmarks/preprocess_bench.py --repeat 5 --scale 4
+
+Needs the system tesseract binary.
+"""
+import argparse
+import io
+import os
+import statistics
+import sys
+from pathlib import Path
+
+from PIL import Image
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+# The sample cards carry made-up ID numbers that fail the Verhoeff/PAN checks
+os.environ.setdefault("EXTRACT_VERIFY_CHECKSUMS", "0")
+
+from app.config import PREPROCESS_STAGES  # noqa: E402
+from app.ocr import run_ocr_sync  # noqa: E402
+from app.extract import extract  # noqa: E402
+from app.preprocess import parse_stages  # noqa: E402
+
+SAMPLES = ROOT / "test images"
+
+# Fields printed on the sample cards
+GROUND_TRUTH = {
+    "aadhaar_card.png": {
+        "aadhaarNumber": "266677554433",
+        "name": "Kavita Saini",
+        "dob": "1996-12-31",
+        "gender": "Female",
+    },
+    "pan_card.png": {
+        "panNumber": "JGOWF9633C",
+        "name": "Kavita Saini",
+        "fatherName": "Pawan Sharma",
+    },
+}
+
+
+def load_samples(scale):
+    samples = {}
+    for name in GROUND_TRUTH:
+        image = Image.open(SAMPLES / name)
+        if scale != 1:
+            image = image.resize((image.width * scale, image.height * scale), Image.BICUBIC)
+        buf = io.BytesIO()
+        image.save(buf, format="PNG")
+        samples[name] = buf.getvalue()
+    return samples
+
+
+def configurations():
+    default = parse_stages(PREPROCESS_STAGES)
+    configs = {"none": [], "all": default}
+    for stage in default:
+        configs[f"all -{stage}"] = [s for s in default if s != stage]
+    if "deskew" not in default:
+        configs["all +deskew"] = default + ["deskew"]
+    return configs
+
+
+def run(samples, stages, repeat):
+    latencies, ocr_times, correct, total = [], [], 0, 0
+    for name, data in samples.items():
+        for _ in range(repeat):
+            # Full-page OCR: a matched template would OCR field crops instead
+            result = run_ocr_sync(data, stages, templates=False)
+            latencies.append(sum(result["timings"].values()))
+            ocr_times.append(result["timings"]["ocr"])
+        parsed, _ = extract(result["text"])
+        for field, expected in GROUND_TRUTH[name].items():
+            total += 1
+            correct += parsed.get(field) == expected
+    return statistics.fmean(latencies), statistics.fmean(ocr_times), correct, total
+
+
+def main(args):
+    samples = load_samples(args.scale)
+    print(f"{'config':<22} {'total ms':>9} {'ocr ms':>9} {'fields':>8}")
+    for label, stages in configurations().items():
+        total_ms, ocr_ms, correct, total = run(samples, stages, args.repeat)
+        print(f"{label:<22} {total_ms:>9.1f} {ocr_ms:>9.1f} {correct:>4}/{total:<3}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--scale", type=int, default=1, help="upsample factor applied to the samples")
+    main(parser.parse_args())
@@ -0,0 +1,118 @@
+"""Seeded-data benchmark for GET /api/get-user-docs against a local mongod.
+
+Seeds one user with ``--docs`` uploads (each with ``--raw-kb`` of rawText)
+into a throwaway database, then compares materialising every document at
+once (the old endpoint behaviour) with walking the paginated, streamed
+endpoint page by page. Reports wall time, response bytes and peak Python
+memory (tracemalloc) for both.
+
+    python benchmarks/user_docs_bench.py --docs 20000 --raw-kb 4 --limit 100
+
+Needs a running mongod (MONGO_URI) and httpx. The database named by
+``--db`` (default kyc_bench) is dropped first.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, default=10000)
+    parser.add_argument("--raw-kb", type=int, default=4, help="rawText size per document")
+    parser.add_argument("--limit", type=int, default=100, help="page size")
+    parser.add_argument("--db", default="kyc_bench")
+    return parser.parse_args()
+
+
+ARGS = parse_args()
+os.environ["DB_NAME"] = ARGS.db
+
+import httpx  # noqa: E402
+from bson import ObjectId  # noqa: E402
+
+from app import db  # noqa: E402
+from app.main import app, get_current_user  # noqa: E402
+
+USER = {"_id": ObjectId(), "email": "bench@example.com"}
+
+
+async def seed():
+    repo = db.get_repo()
+    await repo.client.drop_database(ARGS.db)
+    await repo.ensure_indexes()
+    raw = "x" * (ARGS.raw_kb * 1024)
+    start = datetime.utcnow()
+    batch = []
+    for i in range(ARGS.docs):
+        batch.append({
+            "userId": str(USER["_id"]),
+            "filename": f"doc{i}.png",
+            "docType": "PAN" if i % 2 else "Aadhaar",
+            "rawText": raw,
+            "parsed": {"panNumber": None, "aadhaarNumber": None, "name": "Bench User"},
+            "processingTimeMs": 100,
+            "uploadedAt": (start + timedelta(milliseconds=i)).isoformat(),
+        })
+        if len(batch) == 1000:
+            await repo.documents.insert_many(batch)
+            batch = []
+    if batch:
+        await repo.documents.insert_many(batch)
+
+
+async def measure(label, coro_fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    size, count = await coro_fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<28} {elapsed * 1000:>9.0f} ms {size / 1e6:>9.1f} MB {peak / 1e6:>9.1f} MB peak  ({count} docs)")
+
+
+async def full_materialisation():
+    docs = await db.get_repo().documents.find({"userId": str(USER["_id"])}).to_list(None)
+    for doc in docs:
+        doc["_id"] = str(doc["_id"])
+    return sum(len(str(doc)) for doc in docs), len(docs)
+
+
+async def paginated():
+    size = count = 0
+    params = {"limit": ARGS.limit}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        while True:
+            r = await http.get("/api/get-user-docs", params=params)
+            r.raise_for_status()
+            body = r.json()
+            size += len(r.content)
+            count += len(body["documents"])
+            if not body["nextCursor"]:
+                return size, count
+            params["cursor"] = body["nextCursor"]
+
+
+async def main():
+    app.dependency_overrides[get_current_user] = lambda: USER
+    # ASGITransport doesn't run the app lifespan
+    await db.connect()
+    await seed()
+    print(f"{'':<28} {'time':>12} {'payload':>12} {'memory':>14}")
+    await measure("find().to_list() + rawText", full_materialisation)
+    await measure(f"paginated, limit={ARGS.limit}", paginated)
+    await db.get_repo().client.drop_database(ARGS.db)
+    db.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
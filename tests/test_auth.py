@@ -0,0 +1,94 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+from mongomock_motor import AsyncMongoMockClient
+
+from app import cache, db, main
+from app.cache import PrincipalCache
+
+EMAIL = "kavita@example.com"
+
+
+@pytest.fixture
+def repo(monkeypatch):
+    repository = db.Repository(AsyncMongoMockClient())
+    monkeypatch.setattr(db, "_repo", repository)
+    return repository
+
+
+@pytest.fixture
+def principals(monkeypatch):
+    fresh = PrincipalCache(maxsize=10, ttl=60)
+    monkeypatch.setattr(main, "principal_cache", fresh)
+    return fresh
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+def add_user(repo):
+    user_id = ObjectId()
+    asyncio.run(repo.users.insert_one({"_id": user_id, "email": EMAIL, "name": "Kavita", "password": "x"}))
+    return user_id
+
+
+def token(user_id, **kwargs):
+    return main.create_access_token({"sub": EMAIL, "uid": str(user_id), "name": "Kavita"}, **kwargs)
+
+
+def current_user(access_token):
+    return asyncio.run(main.get_current_user(access_token))
+
+
+def test_user_is_cached_until_invalidated(repo, principals):
+    user_id = add_user(repo)
+    access_token = token(user_id)
+    assert current_user(access_token)["_id"] == user_id
+    assert "password" not in current_user(access_token)
+    assert (principals.hits, principals.misses) == (1, 1)
+
+    asyncio.run(repo.users.update_one({"_id": user_id}, {"$set": {"name": "Kavita S"}}))
+    assert current_user(access_token)["name"] == "Kavita"
+    principals.invalidate(EMAIL)
+    assert current_user(access_token)["name"] == "Kavita S"
+
+
+def test_cached_user_expires(repo, principals, clock):
+    user_id = add_user(repo)
+    current_user(token(user_id))
+    asyncio.run(repo.users.delete_one({"_id": user_id}))
+    current_user(token(user_id))
+    clock[0] += 61
+    with pytest.raises(HTTPException) as rejected:
+        current_user(token(user_id))
+    assert rejected.value.status_code == 401
+
+
+def test_trusted_claims_skip_the_database(monkeypatch, principals):
+    # No repository connected: any lookup would raise
+    monkeypatch.setattr(db, "_repo", None)
+    monkeypatch.setattr(main, "AUTH_TRUST_TOKEN_CLAIMS", True)
+    user_id = ObjectId()
+    assert current_user(token(user_id)) == {"_id": user_id, "email": EMAIL, "name": "Kavita"}
+    assert principals.claims == 1
+
+
+def test_untrusted_claims_need_an_existing_user(repo, principals, monkeypatch):
+    monkeypatch.setattr(main, "AUTH_TRUST_TOKEN_CLAIMS", False)
+    with pytest.raises(HTTPException) as rejected:
+        current_user(token(ObjectId()))
+    assert rejected.value.detail == "User not found"
+
+
+def test_expired_token(repo, principals):
+    user_id = add_user(repo)
+    with pytest.raises(HTTPException) as rejected:
+        current_user(token(user_id, expires_delta=timedelta(seconds=-1)))
+    assert rejected.value.detail == "Token expired"
@@ -0,0 +1,103 @@
+import asyncio
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+from pymongo.errors import PyMongoError
+
+from app import cache
+from app.cache import OCRCache, TTLCache, ocr_cache_key
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(cache.time, "monotonic", fake)
+    return fake
+
+
+def test_ttl_cache_expiry_and_lru(clock):
+    entries = TTLCache(maxsize=2, ttl=10)
+    entries.set("a", 1)
+    entries.set("b", 2)
+    assert entries.get("a") == 1
+    # "b" is now least recently used
+    entries.set("c", 3)
+    assert entries.get("b") is None
+    clock.now += 11
+    assert entries.get("a") is None
+    assert len(entries) == 1
+
+
+def test_cache_key_depends_on_page():
+    assert ocr_cache_key("abc") == ocr_cache_key("abc")
+    assert len({ocr_cache_key("abc"), ocr_cache_key("abc", 0), ocr_cache_key("abc", 1)}) == 3
+
+
+def collection():
+    return AsyncMongoMockClient()["test"]["ocr_cache"]
+
+
+def test_memory_then_mongo_then_miss():
+    async def run():
+        shared = collection()
+        first = OCRCache(shared, maxsize=10, ttl=60, enabled=True)
+        await first.put("k", {"text": "hello", "timings": {"ocr": 5}}, ocr_ms=120)
+        assert await first.get("k") == {"text": "hello"}
+
+        # Another process: nothing in memory, found in Mongo, then in memory
+        second = OCRCache(shared, maxsize=10, ttl=60, enabled=True)
+        assert await second.get("k") == {"text": "hello"}
+        assert await second.get("k") == {"text": "hello"}
+        assert await second.get("other") is None
+        return first.stats(), second.stats()
+
+    first, second = asyncio.run(run())
+    assert (first["memoryHits"], first["mongoHits"], first["misses"]) == (1, 0, 0)
+    assert (second["memoryHits"], second["mongoHits"], second["misses"]) == (1, 1, 1)
+    assert second["savedOcrMs"] == 240
+    assert second["hitRate"] == round(2 / 3, 4)
+
+
+def test_first_result_stored_wins():
+    async def run():
+        shared = collection()
+        await OCRCache(shared, enabled=True).put("k", {"text": "first"}, ocr_ms=1)
+        await OCRCache(shared, enabled=True).put("k", {"text": "second"}, ocr_ms=1)
+        return await OCRCache(shared, enabled=True).get("k"), await shared.count_documents({})
+
+    assert asyncio.run(run()) == ({"text": "first"}, 1)
+
+
+def test_mongo_errors_are_misses():
+    class Broken:
+        async def find_one(self, *args, **kwargs):
+            raise PyMongoError("down")
+
+        async def update_one(self, *args, **kwargs):
+            raise PyMongoError("down")
+
+    async def run():
+        ocr_cache = OCRCache(Broken(), enabled=True)
+        await ocr_cache.put("k", {"text": "x"}, ocr_ms=1)
+        ocr_cache.memory.clear()
+        return await ocr_cache.get("k"), ocr_cache.stats()["misses"]
+
+    assert asyncio.run(run()) == (None, 1)
+
+
+def test_disabled_cache_stores_nothing():
+    async def run():
+        shared = collection()
+        ocr_cache = OCRCache(shared, enabled=False)
+        await ocr_cache.put("k", {"text": "x"}, ocr_ms=1)
+        return await ocr_cache.get("k"), await shared.count_documents({})
+
+    assert asyncio.run(run()) == (None, 0)
@@ -0,0 +1,37 @@
+import asyncio
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+from pymongo.errors import BulkWriteError
+
+from app.db import Repository
+
+
+def pair(number):
+    return {"userId": "u1", "docType": "PAN"}, {"userId": "u1", "parsedData": {"panNumber": number}}
+
+
+def test_insert_documents_links_both_halves():
+    async def run():
+        repo = Repository(AsyncMongoMockClient())
+        ids = await repo.insert_documents([pair("ABCPE1234F"), pair("ABCPE1234G")])
+        kycs = await repo.kyc.find({}, sort=[("parsedData.panNumber", 1)]).to_list(None)
+        return ids, [kyc["documentId"] for kyc in kycs], await repo.documents.count_documents({})
+
+    ids, linked, documents = asyncio.run(run())
+    assert linked == ids
+    assert documents == 2
+
+
+def test_failed_half_is_compensated():
+    async def run():
+        repo = Repository(AsyncMongoMockClient())
+        # Makes the kyc_data insert fail after uploaded_documents succeeded
+        await repo.kyc.create_index("parsedData.panNumber", unique=True)
+        await repo.insert_documents([pair("ABCPE1234F")])
+        with pytest.raises(BulkWriteError):
+            await repo.insert_documents([pair("ABCPE1234G"), pair("ABCPE1234F")])
+        return await repo.documents.count_documents({}), await repo.kyc.count_documents({})
+
+    # Only the first call's pair remains; neither half of the failed batch does
+    assert asyncio.run(run()) == (1, 1)
@@ -0,0 +1,61 @@
+import asyncio
+import json
+
+import pytest
+from bson import ObjectId
+from mongomock_motor import AsyncMongoMockClient
+
+from app.documents import InvalidCursor, decode_cursor, encode_cursor, open_page, stream_page
+
+
+def test_cursor_round_trip():
+    doc = {"uploadedAt": "2024-05-01T10:00:00.123456", "_id": ObjectId()}
+    assert decode_cursor(encode_cursor(doc)) == (doc["uploadedAt"], doc["_id"])
+
+
+@pytest.mark.parametrize("cursor", ["", "not base64!", encode_cursor({"uploadedAt": "x", "_id": "nope"})])
+def test_invalid_cursor(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor)
+
+
+async def read_all_pages(collection, user_id, limit):
+    pages, cursor = [], None
+    while True:
+        docs = open_page(user_id, limit, cursor, collection=collection)
+        first = await anext(docs, None)
+        body = "".join([chunk async for chunk in stream_page({"user": user_id}, first, docs, limit)])
+        page = json.loads(body)
+        pages.append([doc["_id"] for doc in page["documents"]])
+        cursor = page["nextCursor"]
+        if cursor is None:
+            return pages
+
+
+def test_keyset_pages_cover_every_document_once():
+    async def run():
+        collection = AsyncMongoMockClient()["test"]["documents"]
+        # Several uploads in the same microsecond: _id orders them
+        times = ["2024-05-01T10:00:00"] * 4 + ["2024-05-01T09:00:00"] * 3 + ["2024-05-02T08:00:00"]
+        ids = [ObjectId() for _ in times]
+        await collection.insert_many([
+            {"_id": _id, "userId": "u1", "uploadedAt": at, "rawText": "x"} for _id, at in zip(ids, times)
+        ])
+        await collection.insert_one({"_id": ObjectId(), "userId": "u2", "uploadedAt": times[0]})
+        expected = [str(_id) for _, _id in sorted(zip(times, ids), reverse=True)]
+        return await read_all_pages(collection, "u1", 3), expected
+
+    pages, expected = asyncio.run(run())
+    assert [len(page) for page in pages] == [3, 3, 2]
+    assert [_id for page in pages for _id in page] == expected
+
+
+def test_exact_multiple_of_limit_ends_without_empty_page():
+    async def run():
+        collection = AsyncMongoMockClient()["test"]["documents"]
+        await collection.insert_many([
+            {"userId": "u1", "uploadedAt": f"2024-05-01T10:00:0{i}"} for i in range(4)
+        ])
+        return await read_all_pages(collection, "u1", 2)
+
+    assert [len(page) for page in asyncio.run(run())] == [2, 2]
@@ -0,0 +1,80 @@
+from app.extract import extract, merge_pages, pan_valid, verhoeff_check_digit, verhoeff_valid
+
+AADHAAR = "234567890124"
+
+
+def test_verhoeff_check_digit_makes_number_valid():
+    for digits in ("23456789012", "99999999999", "12345", "0"):
+        assert verhoeff_valid(digits + verhoeff_check_digit(digits))
+
+
+def test_verhoeff_catches_single_digit_and_transposition_errors():
+    assert verhoeff_valid(AADHAAR)
+    assert not verhoeff_valid(AADHAAR[:-1] + "5")
+    assert not verhoeff_valid(AADHAAR[:3] + AADHAAR[4] + AADHAAR[3] + AADHAAR[5:])
+    assert not verhoeff_valid("2345 6789 0124")
+    assert not verhoeff_valid("")
+
+
+def test_pan_valid():
+    assert pan_valid("ABCPE1234F")
+    assert pan_valid("AAACB1234Z")
+    # 4th letter is not a holder type
+    assert not pan_valid("ABCXE1234F")
+    assert not pan_valid("ABCPE1234")
+    assert not pan_valid("ABCPE12345")
+    assert not pan_valid("1BCPE1234F")
+
+
+def test_extract_labelled_fields_on_one_line():
+    parsed, confidence = extract(
+        f"Name: Ramesh Kumar Father's Name: Suresh Kumar\nDOB: 01/02/1990 Male\n{AADHAAR[:4]} {AADHAAR[4:8]} {AADHAAR[8:]}"
+    )
+    assert parsed["name"] == "Ramesh Kumar"
+    assert parsed["fatherName"] == "Suresh Kumar"
+    assert parsed["dob"] == "01/02/1990"
+    assert parsed["gender"] == "Male"
+    assert parsed["aadhaarNumber"] == AADHAAR
+    assert confidence["aadhaarNumber"] == 0.99
+
+
+def test_extract_value_on_the_line_after_its_label():
+    parsed, _ = extract("GOVT OF INDIA\nName\nRamesh Kumar\nFather's Name\nSuresh")
+    assert parsed["name"] == "Ramesh Kumar"
+    assert parsed["fatherName"] == "Suresh"
+
+
+def test_extract_multi_line_address_stops_at_next_field():
+    parsed, _ = extract(
+        f"Address: 12 MG Road\nIndiranagar\nBangalore 560038\n{AADHAAR}\nABCPE1234F"
+    )
+    assert parsed["address"] == "12 MG Road Indiranagar Bangalore 560038"
+    assert parsed["aadhaarNumber"] == AADHAAR
+    assert parsed["panNumber"] == "ABCPE1234F"
+
+
+def test_extract_rejects_numbers_failing_their_checks():
+    parsed, confidence = extract("234567890125\nABCXE1234F\nDOB: 31/02/1990")
+    assert parsed["aadhaarNumber"] is None
+    assert parsed["panNumber"] is None
+    assert parsed["dob"] is None
+    assert confidence["aadhaarNumber"] == 0.0
+
+
+def test_merge_pages_keeps_most_confident_value_earlier_page_on_ties():
+    front = extract(f"Name: Ramesh\n{AADHAAR}")
+    back = extract("Name: Ramesh Kumar\nAddress: 12 MG Road")
+    again = extract("Address: 14 MG Road")
+    parsed, confidence, field_pages = merge_pages([front, back, again])
+    assert parsed["name"] == "Ramesh Kumar"
+    assert parsed["aadhaarNumber"] == AADHAAR
+    assert parsed["address"] == "12 MG Road"
+    assert parsed["dob"] is None
+    assert confidence["name"] == 0.85
+    assert field_pages == {"name": 2, "aadhaarNumber": 1, "address": 2}
+
+
+def test_merge_pages_of_nothing():
+    parsed, confidence, field_pages = merge_pages([])
+    assert set(parsed.values()) == {None}
+    assert field_pages == {}
@@ -0,0 +1,26 @@
+"""Extraction throughput over a synthetic corpus (pytest-benchmark).
+
+Track it across changes with
+
+    python -m pytest tests/test_extract_bench.py --benchmark-autosave
+    python -m pytest tests/test_extract_bench.py --benchmark-compare
+"""
+import pytest
+
+from app.extract import extract_many
+from benchmarks.extract_bench import corpus
+
+CORPUS_SIZE = 5000
+
+
+@pytest.fixture(scope="module")
+def docs():
+    return corpus(CORPUS_SIZE, seed=1)
+
+
+def test_extract_many_throughput(benchmark, docs):
+    benchmark.extra_info["texts"] = CORPUS_SIZE
+    results = benchmark(extract_many, [text for text, _ in docs])
+
+    for (_, truth), (parsed, _) in zip(docs, results):
+        assert {field: parsed[field] for field in truth} == truth
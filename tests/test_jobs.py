@@ -0,0 +1,174 @@
+import asyncio
+import io
+import zipfile
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import UploadFile
+from mongomock_motor import AsyncMongoMockClient
+from PIL import Image
+
+from app import jobs, utils
+from app.jobs import BatchQueue
+from app.utils import UploadRejected
+
+
+def queue():
+    return BatchQueue(collection=AsyncMongoMockClient()["test"]["ingest_jobs"])
+
+
+def staged(count):
+    return [(f"card{i}.png", {"path": f"/tmp/card{i}.png"}) for i in range(count)]
+
+
+def test_concurrent_claims_never_share_a_file():
+    async def run():
+        jobs = queue()
+        await jobs.enqueue("u1", staged(3))
+        await jobs.enqueue("u2", staged(2))
+        claims = await asyncio.gather(*(jobs.claim() for _ in range(7)))
+        return jobs, [(job["_id"], item["index"]) for job, item in claims if job is not None]
+
+    jobs, claimed = asyncio.run(run())
+    assert len(claimed) == 5
+    assert len(set(claimed)) == 5
+
+
+def test_claims_oldest_job_first_and_marks_it_processing():
+    async def run():
+        jobs = queue()
+        first = await jobs.enqueue("u1", staged(1))
+        await jobs.enqueue("u2", staged(1))
+        job, item = await jobs.claim()
+        return first, job, item
+
+    first, job, item = asyncio.run(run())
+    assert str(job["_id"]) == first
+    assert job["status"] == "processing"
+    assert item["status"] == "processing"
+    assert item["claimedAt"] is not None
+
+
+def test_finish_completes_job_once_every_file_is_done():
+    async def run():
+        jobs = queue()
+        job_id = await jobs.enqueue("u1", staged(2))
+        states = []
+        for failed in (False, True):
+            job, item = await jobs.claim()
+            await jobs.finish(job["_id"], item["index"], {"docType": "PAN"}, failed=failed)
+            states.append((await jobs.get_job(job_id, "u1"))["status"])
+        return states, await jobs.get_job(job_id, "u1"), await jobs.get_job(job_id, "u2")
+
+    states, job, other_user = asyncio.run(run())
+    assert states == ["processing", "completed"]
+    assert (job["processed"], job["failed"]) == (1, 1)
+    assert [item["status"] for item in job["files"]] == ["done", "failed"]
+    # Stored paths are not exposed, nor other users' jobs
+    assert all("path" not in item["file"] for item in job["files"])
+    assert other_user is None
+
+
+def test_stale_claims_are_requeued():
+    async def run():
+        jobs = queue()
+        await jobs.enqueue("u1", staged(2))
+        job, stale = await jobs.claim()
+        await jobs.claim()
+        await jobs.collection.update_one(
+            {"_id": job["_id"]},
+            {"$set": {f"files.{stale['index']}.claimedAt": datetime.utcnow() - timedelta(days=1)}},
+        )
+        await jobs.requeue_stale()
+        _, item = await jobs.claim()
+        return stale, item, await jobs.claim()
+
+    stale, item, nothing = asyncio.run(run())
+    assert item["index"] == stale["index"]
+    assert nothing == (None, None)
+
+
+def upload(name, data):
+    return UploadFile(io.BytesIO(data), filename=name)
+
+
+def png(seed):
+    buffer = io.BytesIO()
+    Image.new("L", (8, 8), seed).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def zipped(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, "UPLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr(utils, "OBJECTS_DIR", tmp_path / "objects")
+    monkeypatch.setattr(utils, "SPOOL_DIR", tmp_path / "tmp")
+    monkeypatch.setattr(jobs, "BATCH_MAX_FILES", 3)
+    return tmp_path
+
+
+def stored_files(root):
+    return sorted(path.name for path in root.rglob("*") if path.is_file())
+
+
+def test_stage_uploads_expands_zips(storage):
+    files = [upload("a.png", png(1)), upload("cards.zip", zipped({"b.png": png(2), "notes.txt": b"hi", "c.png": b""}))]
+    staged = asyncio.run(jobs.stage_uploads(files))
+    assert [name for name, _ in staged] == ["a.png", "b.png"]
+    assert stored_files(storage / "objects") == sorted(stored["path"].rsplit("/", 1)[1] for _, stored in staged)
+    assert stored_files(storage / "tmp") == []
+
+
+@pytest.mark.parametrize("files", [
+    lambda: [upload(f"{i}.png", png(i)) for i in range(4)],
+    lambda: [upload("a.png", png(1)), upload("cards.zip", zipped({f"{i}.png": png(i) for i in range(2, 6)}))],
+    lambda: [upload("a.png", png(1)), upload("empty.png", b"")],
+    lambda: [upload("a.png", png(1)), upload("bad.zip", b"PK\x03\x04 not a zip")],
+    lambda: [upload("cards.zip", zipped({"a.png": png(1), "huge.png": png(2) + bytes(utils.UPLOAD_MAX_BYTES)}))],
+])
+def test_rejected_batch_stores_nothing(storage, files):
+    with pytest.raises(UploadRejected):
+        asyncio.run(jobs.stage_uploads(files()))
+    assert stored_files(storage) == []
+
+
+def test_workers_requeue_claims_left_by_a_failed_batch(monkeypatch):
+    monkeypatch.setattr(jobs, "BATCH_CLAIM_TIMEOUT", 0.3)
+    monkeypatch.setattr(jobs, "BATCH_POLL_INTERVAL", 0.05)
+
+    async def run():
+        batch = queue()
+
+        async def process_batch():
+            job, item = await batch.claim()
+            if job is None:
+                return False
+            await batch.finish(job["_id"], item["index"], {})
+            return True
+
+        batch.process_batch = process_batch
+        job_id = await batch.enqueue("u1", staged(2))
+        # A batch that claimed this file and then failed before finishing it
+        await batch.claim()
+        await batch.start(workers=1)
+        try:
+            for _ in range(100):
+                job = await batch.get_job(job_id, "u1")
+                if job["status"] == "completed":
+                    break
+                await asyncio.sleep(0.02)
+        finally:
+            await batch.stop()
+        return job
+
+    job = asyncio.run(run())
+    assert job["status"] == "completed"
+    assert [item["status"] for item in job["files"]] == ["done", "done"]
@@ -0,0 +1,57 @@
+import pytest
+
+from app import main
+from app.metrics import Counter, Gauge, Histogram, Registry
+
+
+def test_counter_and_gauge_rendering():
+    registry = Registry()
+    requests = Counter("http_total", "Requests.", ["route", "status"], registry=registry)
+    requests.inc(route="/upload/", status="200")
+    requests.inc(2, route="/upload/", status="200")
+    requests.inc(route='/a"b\\c', status="500")
+    Gauge("pending", "Pending jobs.", registry=registry, collect=lambda: 3)
+
+    assert registry.render() == (
+        "# HELP http_total Requests.\n"
+        "# TYPE http_total counter\n"
+        'http_total{route="/a\\"b\\\\c",status="500"} 1\n'
+        'http_total{route="/upload/",status="200"} 3\n'
+        "# HELP pending Pending jobs.\n"
+        "# TYPE pending gauge\n"
+        "pending 3\n"
+    )
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    latency = Histogram("latency_seconds", "Latency.", ["stage"], registry=registry, buckets=(0.1, 1))
+    for value in (0.05, 0.5, 0.5, 5):
+        latency.observe(value, stage="ocr")
+
+    lines = registry.render().splitlines()[2:]
+    assert lines == [
+        'latency_seconds_bucket{stage="ocr",le="0.1"} 1',
+        'latency_seconds_bucket{stage="ocr",le="1.0"} 3',
+        'latency_seconds_bucket{stage="ocr",le="+Inf"} 4',
+        'latency_seconds_sum{stage="ocr"} 6.05',
+        'latency_seconds_count{stage="ocr"} 4',
+    ]
+
+
+def test_labels_and_names_are_checked():
+    registry = Registry()
+    counter = Counter("total", "Things.", ["kind"], registry=registry)
+    with pytest.raises(ValueError):
+        counter.inc(other="x")
+    with pytest.raises(ValueError):
+        Counter("total", "Again.", registry=registry)
+
+
+def test_metrics_endpoint():
+    response = main.metrics()
+    body = response.body.decode()
+    assert response.media_type == "text/plain; version=0.0.4"
+    assert body.endswith("\n")
+    for name in ("kyc_stage_seconds", "kyc_ocr_queue_capacity", "kyc_ocr_cache_lookups_total"):
+        assert f"# TYPE {name} " in body
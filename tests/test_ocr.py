@@ -0,0 +1,110 @@
+import asyncio
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import pytesseract
+from PIL import Image
+
+from app import ocr, ocr_backends
+
+
+def png():
+    buffer = io.BytesIO()
+    Image.new("L", (200, 120), 255).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def fresh_pool(monkeypatch):
+    monkeypatch.setattr(ocr, "_executor", None)
+    yield
+    ocr.shutdown_executor()
+
+
+def test_missing_tesseract_fails_the_job_not_the_pool(fresh_pool, monkeypatch):
+    # Workers forked from this process inherit the attributes, workers
+    # started fresh read the environment
+    missing = "/nonexistent/tesseract"
+    monkeypatch.setenv("TESSERACT_CMD", missing)
+    monkeypatch.setenv("OCR_BACKEND", "pytesseract")
+    monkeypatch.setattr(pytesseract.pytesseract, "tesseract_cmd", missing)
+    monkeypatch.setattr(ocr_backends, "_backend", ocr_backends.PytesseractBackend())
+
+    async def run():
+        for _ in range(2):
+            with pytest.raises(ocr.OCRUnavailable, match="Tesseract binary not found"):
+                await ocr.run_ocr(png())
+            pool = ocr._executor
+            assert pool is not None
+        return pool
+
+    pool = asyncio.run(run())
+    assert pool is ocr._executor
+    assert ocr.pending_jobs() == 0
+
+
+def test_queue_full_rejects_without_submitting(monkeypatch):
+    release = threading.Event()
+    submitted = []
+
+    def blocking_ocr(source, page=None):
+        submitted.append(source)
+        release.wait(5)
+        return {"text": "", "phash": None, "timings": {}}
+
+    executor = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(ocr, "_executor", executor)
+    monkeypatch.setattr(ocr, "run_ocr_sync", blocking_ocr)
+    monkeypatch.setattr(ocr, "OCR_WORKERS", 1)
+    monkeypatch.setattr(ocr, "OCR_QUEUE_DEPTH", 1)
+
+    async def run():
+        running = [asyncio.create_task(ocr.run_ocr(name)) for name in ("a", "b")]
+        await asyncio.sleep(0.05)
+        assert ocr.pending_jobs() == 2
+        with pytest.raises(ocr.OCRQueueFull):
+            await ocr.run_ocr("c")
+        release.set()
+        await asyncio.gather(*running)
+
+    try:
+        asyncio.run(run())
+    finally:
+        executor.shutdown()
+    assert sorted(submitted) == ["a", "b"]
+    assert ocr.pending_jobs() == 0
+
+
+def test_cancelled_job_counts_until_its_worker_is_free(monkeypatch):
+    release = threading.Event()
+
+    def blocking_ocr(source, page=None):
+        release.wait(5)
+        return {"text": "", "phash": None, "timings": {}}
+
+    executor = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(ocr, "_executor", executor)
+    monkeypatch.setattr(ocr, "run_ocr_sync", blocking_ocr)
+
+    async def run():
+        running = asyncio.create_task(ocr.run_ocr("a"))
+        queued = asyncio.create_task(ocr.run_ocr("b"))
+        await asyncio.sleep(0.05)
+        running.cancel()
+        queued.cancel()
+        await asyncio.gather(running, queued, return_exceptions=True)
+        # "b" never reached a worker; "a" still occupies one
+        assert ocr.pending_jobs() == 1
+        release.set()
+        for _ in range(100):
+            if not ocr.pending_jobs():
+                break
+            await asyncio.sleep(0.01)
+        assert ocr.pending_jobs() == 0
+
+    try:
+        asyncio.run(run())
+    finally:
+        executor.shutdown()
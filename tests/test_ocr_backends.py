@@ -0,0 +1,43 @@
+import sys
+import types
+
+import pytest
+
+from app import ocr_backends
+
+
+@pytest.fixture
+def tesserocr(monkeypatch):
+    """Installs a stand-in tesserocr module; returns a dict to make it fail."""
+    state = {"error": None}
+
+    class PyTessBaseAPI:
+        def __init__(self, **kwargs):
+            if state["error"]:
+                raise state["error"]
+
+        def End(self):
+            pass
+
+    monkeypatch.setitem(sys.modules, "tesserocr", types.SimpleNamespace(PyTessBaseAPI=PyTessBaseAPI))
+    monkeypatch.setattr(ocr_backends, "available_backends", lambda: ["pytesseract", "tesserocr"])
+    monkeypatch.setattr(ocr_backends, "_backend", None)
+    ocr_backends._resolve_auto.cache_clear()
+    yield state
+    ocr_backends._resolve_auto.cache_clear()
+
+
+def test_auto_uses_working_tesserocr(tesserocr):
+    assert ocr_backends.backend_name("auto") == "tesserocr"
+
+
+def test_auto_reports_the_fallback_for_broken_tesserocr(tesserocr):
+    tesserocr["error"] = RuntimeError("Failed to init API, possibly an invalid tessdata path")
+    assert ocr_backends.backend_name("auto") == "pytesseract"
+    # The cache key names the backend the workers actually use
+    assert ocr_backends.get_backend().name == ocr_backends.backend_name("auto")
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        ocr_backends.backend_name("easyocr")
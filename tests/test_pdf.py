@@ -0,0 +1,35 @@
+import pypdfium2 as pdfium
+import pytest
+
+from app import ocr, pdf
+
+
+@pytest.fixture
+def blank_pdf(tmp_path):
+    path = tmp_path / "blank.pdf"
+    document = pdfium.PdfDocument.new()
+    for _ in range(2):
+        document.new_page(612, 792)
+    document.save(path)
+    return str(path)
+
+
+def test_render_caps_pixel_count(blank_pdf):
+    # 8.5 x 11 in at 300 DPI is 2550 x 3300, give or take rounding
+    width, height = pdf.render_page(blank_pdf, 0, dpi=300).size
+    assert abs(width - 2550) <= 1 and abs(height - 3300) <= 1
+    width, height = pdf.render_page(blank_pdf, 1, max_pixels=1_000_000).size
+    # Rendered sizes are rounded up to whole pixels
+    assert width * height <= 1_000_000 + width + height
+    assert abs(width / height - 612 / 792) < 0.01
+
+
+def test_worker_started_while_lock_is_held(blank_pdf, monkeypatch):
+    monkeypatch.setattr(ocr, "_executor", None)
+    try:
+        with pdf._PDFIUM_LOCK:
+            # The pool starts its workers now, as a page count is running
+            future = ocr._get_executor().submit(pdf.page_count, blank_pdf)
+            assert future.result(timeout=30) == 2
+    finally:
+        ocr.shutdown_executor()
@@ -0,0 +1,82 @@
+import random
+
+import pytest
+from PIL import Image, ImageDraw
+
+from app.phash import HASH_BITS, HashIndex, dhash, hamming, informative
+
+
+def flip(value, bits, rng):
+    for bit in rng.sample(range(HASH_BITS), bits):
+        value ^= 1 << bit
+    return value
+
+
+def card(seed):
+    rng = random.Random(seed)
+    image = Image.new("RGB", (856, 540), "white")
+    draw = ImageDraw.Draw(image)
+    for _ in range(40):
+        x, y = rng.randrange(800), rng.randrange(500)
+        draw.rectangle((x, y, x + rng.randrange(10, 60), y + rng.randrange(5, 30)), fill=(0, 0, 0))
+    return image
+
+
+def test_dhash_survives_rescaling_and_tells_cards_apart():
+    image = card(1)
+    value = dhash(image)
+    assert informative(value)
+    assert hamming(value, dhash(image.resize((428, 270)))) <= 6
+    assert hamming(value, dhash(card(2))) > 6
+
+
+def test_blank_page_hash_is_not_informative():
+    assert dhash(Image.new("L", (1000, 1400), 245)) == 0
+    assert not informative(0)
+    assert not informative((1 << HASH_BITS) - 1)
+
+
+@pytest.mark.parametrize("max_distance", [3, 6, 9])
+def test_query_matches_linear_scan(max_distance):
+    rng = random.Random(max_distance)
+    # Clustered around a few layouts, so chunk buckets are shared as in a real corpus
+    templates = [rng.getrandbits(HASH_BITS) for _ in range(3)]
+    hashes = [flip(rng.choice(templates), 16, rng) for _ in range(3000)]
+    index = HashIndex(max_distance)
+    for i, value in enumerate(hashes):
+        index.add(value, f"user{i % 7}", i.to_bytes(12, "big"))
+        if i == 2500:
+            # The rest stay pending, compared directly
+            index.rebuild()
+
+    for _ in range(50):
+        query = flip(rng.choice(hashes), rng.randint(0, max_distance + 2), rng)
+        expected = sorted(
+            (hamming(value, query), i) for i, value in enumerate(hashes) if hamming(value, query) <= max_distance
+        )
+        found = index.query(query)
+        assert [(distance, int.from_bytes(document, "big")) for distance, _, document in found] == expected
+        assert all(owner == f"user{int.from_bytes(document, 'big') % 7}" for _, owner, document in found)
+
+
+def test_query_limit_and_smaller_distance():
+    index = HashIndex(6)
+    base = random.Random(0).getrandbits(HASH_BITS)
+    for bits in range(8):
+        index.add(base ^ ((1 << bits) - 1), "owner", bits.to_bytes(12, "big"))
+    index.rebuild()
+    assert [distance for distance, _, _ in index.query(base)] == [0, 1, 2, 3, 4, 5, 6]
+    assert [distance for distance, _, _ in index.query(base, limit=2)] == [0, 1]
+    assert [distance for distance, _, _ in index.query(base, max_distance=2)] == [0, 1, 2]
+    # Never beyond the index's own max_distance
+    assert len(index.query(base, max_distance=20)) == 7
+
+
+def test_needs_rebuild_after_pending_max():
+    index = HashIndex(6)
+    rng = random.Random(0)
+    for i in range(HashIndex.PENDING_MAX + 1):
+        index.add(rng.getrandbits(HASH_BITS), "owner", i.to_bytes(12, "big"))
+    assert index.needs_rebuild()
+    index.rebuild()
+    assert not index.needs_rebuild()
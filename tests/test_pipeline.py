@@ -0,0 +1,42 @@
+import asyncio
+
+import pytest
+
+from app import pipeline
+from app.ocr import OCRQueueFull
+
+
+def test_ocr_pages_in_page_order(monkeypatch):
+    async def fake_ocr(stored, page=None):
+        await asyncio.sleep(0.01 * (3 - page))
+        return {"text": f"page {page}"}
+
+    monkeypatch.setattr(pipeline, "ocr_with_cache", fake_ocr)
+    results = asyncio.run(pipeline.ocr_pages([({}, page) for page in range(3)]))
+    assert [result["text"] for result, _ in results] == ["page 0", "page 1", "page 2"]
+
+
+def test_failed_page_cancels_the_others(monkeypatch):
+    started, finished = [], []
+
+    async def fake_ocr(stored, page=None):
+        started.append(page)
+        if page == 0:
+            await asyncio.sleep(0.01)
+            raise OCRQueueFull("full")
+        await asyncio.sleep(1)
+        finished.append(page)
+
+    monkeypatch.setattr(pipeline, "OCR_WORKERS", 2)
+    monkeypatch.setattr(pipeline, "ocr_with_cache", fake_ocr)
+
+    async def run():
+        with pytest.raises(OCRQueueFull):
+            await pipeline.ocr_pages([({}, page) for page in range(6)])
+        # Give anything left running the chance to finish
+        await asyncio.sleep(1.2)
+
+    asyncio.run(run())
+    # Pages in flight were stopped, most of those waiting for a slot never started
+    assert finished == []
+    assert len(started) <= 3
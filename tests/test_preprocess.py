@@ -0,0 +1,37 @@
+import pytest
+from PIL import Image
+
+from app.preprocess import preprocess, resize_to_dpi
+
+
+def image(width, height, dpi=None):
+    result = Image.new("L", (width, height), 255)
+    if dpi:
+        result.info["dpi"] = (dpi, dpi)
+    return result
+
+
+@pytest.mark.parametrize("size, dpi, expected", [
+    # Phone photo of a card: long edge to a card width (85.6 mm) at 300 DPI
+    ((4000, 3000), None, (1011, 758)),
+    # Already about card size
+    ((1024, 512), None, (1024, 512)),
+    # Screenshot: 96 DPI metadata is not a scanner's
+    ((2000, 1200), 96, (1011, 607)),
+    # Card scanned at 600 DPI
+    ((2022, 1275), 600, (1011, 638)),
+    # A4 page scanned at 150 DPI, in either orientation
+    ((1240, 1754), 150, (2480, 3508)),
+    ((1754, 1240), 150, (3508, 2480)),
+    # Portrait page shape without metadata: to an A4 width at 300 DPI
+    ((3000, 4000), None, (2480, 3307)),
+])
+def test_resize_to_dpi(size, dpi, expected):
+    assert resize_to_dpi(image(*size, dpi=dpi), dpi=300).size == expected
+
+
+def test_preprocess_times_every_stage():
+    result, timings = preprocess(image(4000, 3000).convert("RGB"), ["grayscale", "resize", "threshold"])
+    assert result.mode == "L"
+    assert result.size == (1011, 758)
+    assert list(timings) == ["grayscale", "resize", "threshold"]
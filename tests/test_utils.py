@@ -0,0 +1,89 @@
+import asyncio
+import io
+
+import pytest
+from fastapi import UploadFile
+from PIL import Image
+
+from app import utils
+from app.utils import UploadRejected
+
+
+def upload(name, data):
+    return UploadFile(io.BytesIO(data), filename=name)
+
+
+def png(seed):
+    buffer = io.BytesIO()
+    Image.new("L", (8, 8), seed).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, "UPLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr(utils, "OBJECTS_DIR", tmp_path / "objects")
+    monkeypatch.setattr(utils, "SPOOL_DIR", tmp_path / "tmp")
+    return tmp_path
+
+
+def stored_files(root):
+    return sorted(path.name for path in root.rglob("*") if path.is_file())
+
+
+def test_store_uploads_commits_every_page(storage):
+    stored = asyncio.run(utils.store_uploads([upload("front.png", png(1)), upload("back.png", png(2))]))
+    assert [ref["contentType"] for ref in stored] == ["image/png", "image/png"]
+    assert stored_files(storage) == sorted(ref["path"].rsplit("/", 1)[1] for ref in stored)
+
+
+@pytest.mark.parametrize("bad", [b"", b"GIF89a not allowed"])
+def test_rejected_page_stores_nothing(storage, bad):
+    with pytest.raises(UploadRejected):
+        asyncio.run(utils.store_uploads([upload("front.png", png(1)), upload("back.gif", bad)]))
+    assert stored_files(storage) == []
+
+
+@pytest.mark.parametrize("head, expected", [
+    (b"\xff\xd8\xff\xe0" + bytes(12), "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n" + bytes(8), "image/png"),
+    (b"RIFF\x00\x00\x00\x00WEBPVP8 ", "image/webp"),
+    (b"%PDF-1.7\n" + bytes(7), "application/pdf"),
+    (b"GIF89a" + bytes(10), None),
+])
+def test_sniff_type(head, expected):
+    assert utils.sniff_type(head) == expected
+
+
+def test_store_upload_sniffs_content_not_name(storage):
+    stored = asyncio.run(utils.store_upload(upload("card.pdf", png(1))))
+    assert stored["contentType"] == "image/png"
+    assert stored["path"].endswith(".png")
+    assert (storage / stored["path"]).read_bytes() == png(1)
+
+
+def test_store_upload_rejects_type_not_allowed(storage):
+    pdf = b"%PDF-1.7\n" + bytes(100)
+    with pytest.raises(utils.UnsupportedFileType):
+        asyncio.run(utils.store_upload(upload("doc.pdf", pdf)))
+    assert asyncio.run(utils.store_upload(upload("doc.pdf", pdf), allowed=utils.DOCUMENT_TYPES))["size"] == 109
+    assert stored_files(storage / "tmp") == []
+
+
+def test_store_upload_size_cap(storage, monkeypatch):
+    monkeypatch.setattr(utils, "UPLOAD_CHUNK_SIZE", 16)
+    data = png(1)
+    with pytest.raises(utils.UploadTooLarge):
+        asyncio.run(utils.store_upload(upload("big.png", data), max_bytes=len(data) - 1))
+    assert stored_files(storage) == []
+    assert asyncio.run(utils.store_upload(upload("big.png", data), max_bytes=len(data)))["size"] == len(data)
+
+
+def test_identical_uploads_share_one_object(storage):
+    first = asyncio.run(utils.store_upload(upload("a.png", png(1))))
+    second = asyncio.run(utils.store_upload(upload("b.png", png(1))))
+    third = asyncio.run(utils.store_upload(upload("c.png", png(2))))
+    assert first == second
+    assert third["sha256"] != first["sha256"]
+    assert len(stored_files(storage / "objects")) == 2
+    assert stored_files(storage / "tmp") == []